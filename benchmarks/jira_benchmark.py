@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Benchmark of the Jira analytics methods against the local JIRA stand-in.
+
+   Reports wall time, number of requests and peak memory per method and number of issues.
+   The stand-in runs in a separate process, so the peak memory is the client's only.
+
+   Example:
+
+   $ PYTHONPATH=. python benchmarks/jira_benchmark.py --issues 1000,10000,100000 --latency 0.005 --max-results 100
+"""
+
+# standard
+import argparse
+import multiprocessing
+import time
+import tracemalloc
+
+# local
+from spycery.xparty.jira import Jira
+from spycery.xparty.jira_fake import FakeJiraServer
+
+
+METHODS = {
+    "get_all_issues": lambda jira: jira.get_all_issues("project = P1", fields="summary,status"),
+    "get_issues_worklog": lambda jira: jira.get_issues_worklog("project = P1"),
+    "get_issues_creation": lambda jira: jira.get_issues_creation("project = P1"),
+    "get_period_worklog": lambda jira: jira.get_period_worklog("project = P1", time_slot_in_weeks=1, num_time_slots=4),
+    "get_period_issuecreation": lambda jira: jira.get_period_issuecreation("project = P1", time_slot_in_weeks=1, num_time_slots=4),
+    "get_sprint_worklog": lambda jira: jira.get_sprint_worklog("Board 1"),
+    "get_sprint_reports": lambda jira: jira.get_sprint_reports("Board 1"),
+    "get_issues_remaining_estimate": lambda jira: jira.get_issues_remaining_estimate("project = P1"),
+    "get_issues_commented_by_author": lambda jira: jira.get_issues_commented_by_author("user.1", "project = P1"),
+}
+
+
+def serve(conn, options):
+    """Run a fake server in the current process and answer the commands "reset", "count" and "stop" sent over conn."""
+    server = FakeJiraServer(**options)
+    server.start()
+    conn.send(server.url)
+    while True:
+        command = conn.recv()
+        if command == "reset":
+            server.reset_counts()
+            conn.send(None)
+        elif command == "count":
+            conn.send(server.request_count)
+        else:
+            server.stop()
+            conn.send(None)
+            break
+
+
+class ServerProcess(object):
+    """Fake server running in a child process (see serve)."""
+
+    def __init__(self, **options):
+        self.conn, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=serve, args=(child, options), daemon=True)
+        self.process.start()
+        self.url = self.conn.recv()
+
+    def command(self, command):
+        self.conn.send(command)
+        return self.conn.recv()
+
+    @property
+    def request_count(self):
+        return self.command("count")
+
+    def reset_counts(self):
+        self.command("reset")
+
+    def stop(self):
+        self.command("stop")
+        self.process.join()
+
+
+def run(num_issues, methods, latency, max_results, memory=True):
+    """Run given methods against a fake server (in a child process) serving num_issues issues.
+
+        :returns: The list of results (method, issues, seconds, requests, peak memory in bytes).
+    """
+    server = ServerProcess(num_issues=num_issues, latency=latency, max_results=max_results)
+    results = []
+    try:
+        for name in methods:
+            jira = Jira(server.url, "username", "password")
+            server.reset_counts()
+            if memory:
+                tracemalloc.start()
+            started = time.perf_counter()
+            METHODS[name](jira)
+            elapsed = time.perf_counter() - started
+            peak = 0
+            if memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            results.append((name, num_issues, elapsed, server.request_count, peak))
+    finally:
+        server.stop()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--issues", default="1000,10000,100000", help="number(s) of issues (comma separated)")
+    parser.add_argument("--methods", default=",".join(METHODS), help="method(s) to be measured (comma separated)")
+    parser.add_argument("--latency", type=float, default=0.0, help="server latency per request in seconds")
+    parser.add_argument("--max-results", type=int, default=100, help="server cap of maxResults per search request")
+    parser.add_argument("--no-memory", action="store_true", help="do not trace memory (tracing slows down python code)")
+
+    args = parser.parse_args()
+
+    print("{0:<32} {1:>8} {2:>10} {3:>9} {4:>12}".format("method", "issues", "seconds", "requests", "peak [MiB]"))
+    for n in [int(n) for n in args.issues.split(",")]:
+        for name, issues, elapsed, requests, peak in run(n, [m.strip() for m in args.methods.split(",")], args.latency, args.max_results, not args.no_memory):
+            print("{0:<32} {1:>8} {2:>10.3f} {3:>9} {4:>12.2f}".format(name, issues, elapsed, requests, peak / 1024 / 1024), flush=True)
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Benchmark of the Qlik reload orchestration and engine sessions against the local engine stand-in.
+
+   Reports wall time, number of requests and connections and time per item per scenario.
+   Reloads take no time on the stand-in, so the reload scenarios measure orchestration overhead only.
+
+   Example:
+
+   $ PYTHONPATH=. python benchmarks/qlik_benchmark.py --apps 30 --latency 0.002 --sessions 1,4,16
+"""
+
+# standard
+import argparse
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+# local
+from spycery.xparty.qlik import Qlik
+from spycery.xparty.qlik_async import AsyncQlik
+from spycery.xparty.qlik_fake import FakeQlikServer
+from spycery.xparty.qlik_scheduler import QlikReloadScheduler
+
+
+def reload_per_call(server, apps, sessions):
+    """Reload apps one after another, one connection per reload."""
+    qlik = Qlik(server.server)
+    for app in apps:
+        qlik.reload_app(app)
+    return len(apps)
+
+
+def reload_session(server, apps, sessions):
+    """Reload apps one after another within session mode."""
+    with Qlik(server.server, heartbeat=0) as qlik:
+        for app in apps:
+            qlik.reload_app(app)
+    return len(apps)
+
+
+def reload_scheduler(server, apps, sessions):
+    """Reload apps by the scheduler with given number of slots."""
+    QlikReloadScheduler([server.server], max_reloads=sessions, heartbeat=0).run(apps)
+    return len(apps)
+
+
+def layouts_sync(server, apps, sessions):
+    """Get all object layouts of an app by blocking calls, one session per thread."""
+    def run(app):
+        with Qlik(server.server, heartbeat=0) as qlik:
+            handle = qlik._open_doc(app)
+            infos = qlik.apply_method({"handle": handle, "method": "GetAllInfos", "params": {}})["result"]["qInfos"]
+            for info in infos:
+                response = qlik.apply_method({"handle": handle, "method": "GetObject", "params": {"qId": info["qId"]}})
+                qlik.apply_method({"handle": response["result"]["qReturn"]["qHandle"], "method": "GetLayout", "params": {}})
+            return len(infos)
+
+    with ThreadPoolExecutor(max_workers=sessions) as executor:
+        return sum(executor.map(run, [apps[i % len(apps)] for i in range(sessions)]))
+
+
+def layouts_async(server, apps, sessions):
+    """Get all object layouts of an app by pipelined calls, sessions run concurrently."""
+    async def run(app):
+        async with AsyncQlik(server.server) as qlik:
+            handle = await qlik.open_doc(app)
+            infos = await qlik.get_all_infos(handle)
+            return len(await qlik.get_object_layouts(handle, [info["qId"] for info in infos]))
+
+    async def main():
+        return sum(await asyncio.gather(*[run(apps[i % len(apps)]) for i in range(sessions)]))
+
+    return asyncio.run(main())
+
+
+def hypercube(server, apps, sessions):
+    """Extract a hypercube (2 dimensions, 2 measures) into columns."""
+    columns = Qlik(server.server).get_hypercube_columns(apps[0], ["Region", "Product"], ["Sum(Sales)", "Avg(Price)"])
+    return len(columns["Region"])
+
+
+SCENARIOS = {
+    "reload_per_call": reload_per_call,
+    "reload_session": reload_session,
+    "reload_scheduler": reload_scheduler,
+    "layouts_sync": layouts_sync,
+    "layouts_async": layouts_async,
+    "hypercube": hypercube,
+}
+
+
+def run(scenarios, num_apps, sessions, latency, reload_time, num_objects, num_rows, single_app=True):
+    """Run given scenarios against a fake engine serving num_apps apps.
+
+        :returns: The list of results (scenario, sessions, items, seconds, requests, connections).
+    """
+    server = FakeQlikServer(latency=latency, reload_time=reload_time, num_objects=num_objects, num_rows=num_rows, single_app=single_app)
+    server.start()
+    apps = []
+    for i in range(num_apps):
+        apps.append("App {0}.qvf".format(i + 1))
+        with open(os.path.join(server.app_folder, apps[-1]), "wb") as f:
+            f.write(b"qvf")
+
+    results = []
+    try:
+        for name in scenarios:
+            server.reset_counts()
+            started = time.perf_counter()
+            items = SCENARIOS[name](server, apps, sessions)
+            elapsed = time.perf_counter() - started
+            results.append((name, sessions, items, elapsed, server.request_count, server.connection_count))
+    finally:
+        server.stop()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--apps", type=int, default=30, help="number of apps")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="scenario(s) to be measured (comma separated)")
+    parser.add_argument("--sessions", default="1,4", help="number(s) of concurrent sessions resp. reload slots (comma separated)")
+    parser.add_argument("--latency", type=float, default=0.001, help="engine latency per request in seconds")
+    parser.add_argument("--reload-time", type=float, default=0.0, help="duration of a reload in seconds")
+    parser.add_argument("--objects", type=int, default=100, help="number of objects per app")
+    parser.add_argument("--rows", type=int, default=100000, help="number of hypercube rows")
+    parser.add_argument("--multi-app", action="store_true", help="a session can hold several open apps (one by default, as the engine)")
+
+    args = parser.parse_args()
+
+    print("{0:<20} {1:>8} {2:>8} {3:>10} {4:>9} {5:>11} {6:>12}".format("scenario", "sessions", "items", "seconds", "requests", "connections", "ms per item"))
+    for n in [int(n) for n in args.sessions.split(",")]:
+        for name, sessions, items, elapsed, requests, connections in run([s.strip() for s in args.scenarios.split(",")], args.apps, n,
+                                                                         args.latency, args.reload_time, args.objects, args.rows, not args.multi_app):
+            print("{0:<20} {1:>8} {2:>8} {3:>10.3f} {4:>9} {5:>11} {6:>12.3f}".format(name, sessions, items, elapsed, requests, connections,
+                                                                                   elapsed * 1000 / max(1, items)), flush=True)
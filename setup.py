@@ -12,7 +12,7 @@ setup(
     license="MIT",
     packages=find_packages(),
     platforms="any",
-    python_requires=">=3.6",
+    python_requires=">=3.7",
     install_requires=["astor", "graphviz", "matplotlib", "numpy", "pandas", "psutil", "requests_toolbelt", "requests", "websocket-client"],
     keywords="python development tools modules extensions",
     classifiers=[
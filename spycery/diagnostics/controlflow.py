@@ -3,35 +3,92 @@
 
 """This module provides functionality to create control flow graphs (deviation of https://pypi.org/project/pycfg/)."""
 
+from array import array
 import ast
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import io
+import json
+import os
 import re
+import threading
+import tokenize
 import astor
 import graphviz
 
 
+# part of the cache keys of per file graphs, to be increased whenever the generated graphs change
+ANALYZER_VERSION = "2"
+
+
 class ControlFlowRegistry:
-    registry = 0
-    cache = {}
-
-    @classmethod
-    def register(cls, node):
-        node.rid = cls.registry
-        cls.cache[node.rid] = node
-        cls.registry += 1
+    """Registry of the nodes of one control flow graph (each ControlFlow owns one)."""
+
+    def __init__(self):
+        self.registry = 0
+        self.cache = {}
+        self.edges = EdgeIndex()
+        self._lock = threading.Lock()
+
+    def register(self, node):
+        with self._lock:
+            node.rid = self.registry
+            self.cache[node.rid] = node
+            self.registry += 1
         return node.rid
 
-    @classmethod
-    def reset(cls):
-        registry = 0
-        cache = {}
+    def reset(self):
+        with self._lock:
+            self.registry = 0
+            self.cache = {}
+            self.edges.clear()
+
+
+# lists up to this length are searched linearly
+SHORT_EDGE_LIST = 16
+
 
+class EdgeIndex:
+    """Membership index of parent and child lists while a graph is built.
 
-class ControlFlowNode(dict):
+    The lists may be shared by several nodes (a node keeps the list of parents it was created with), so the
+    index is kept per list and catches up with items appended since the last lookup.
+    """
+
+    def __init__(self):
+        self.members = {}
+
+    def contains(self, edges, node):
+        if len(edges) <= SHORT_EDGE_LIST:
+            return node in edges
+        entry = self.members.get(id(edges))
+        if entry is None or len(edges) < entry[2]:
+            # the entry keeps the list alive, so its id isn't reused
+            entry = self.members[id(edges)] = [edges, set(), 0]
+        if entry[2] < len(edges):
+            entry[1].update(e.rid for e in edges[entry[2]:])
+            entry[2] = len(edges)
+        return node.rid in entry[1]
+
+    def clear(self):
+        self.members = {}
 
-    def __init__(self, parents=[], ast=None):
-        self.rid = ControlFlowRegistry.register(self)
 
+class ControlFlowNode:
+
+    __slots__ = ("rid", "registry", "renderer", "_source", "parents", "children", "calls", "ast_node",
+                 "exit_nodes", "return_nodes", "calllink", "calleelink", "fn_exit_node")
+
+    def __init__(self, parents=[], ast=None, registry=None, renderer=None):
         self.parents = (parents[0] if isinstance(parents, tuple) else parents) or []
+        # nodes created outside of a ControlFlow share the registry of their parents or get one of their own
+        # (nothing is kept globally)
+        self.registry = registry or (self.parents[0].registry if self.parents else ControlFlowRegistry())
+        self.rid = self.registry.register(self)
+        self.renderer = renderer
+        self._source = None
+
         self.ast_node = ast
         self.update_children(parents)  # requires self.rid
         self.children = []
@@ -49,11 +106,17 @@ class ControlFlowNode(dict):
     def __neq__(self, other):
         return self.rid != other.rid
 
+    def __hash__(self):
+        return self.rid
+
     def lineno(self):
         return self.ast_node.lineno if hasattr(self.ast_node, "lineno") else 0
 
     def source(self):
-        return astor.to_source(self.ast_node).strip()
+        # rendered once, the ast of a node isn't changed after construction
+        if self._source is None:
+            self._source = (self.renderer or render_source)(self.ast_node)
+        return self._source
 
     def to_json(self):
         return {"id":self.rid, "parents": [p.rid for p in self.parents], "children": [c.rid for c in self.children], "calls": self.calls, "at":self.lineno() ,"ast":self.source()}
@@ -62,7 +125,7 @@ class ControlFlowNode(dict):
         self.parents = p
 
     def add_parent(self, p):
-        if p not in self.parents:
+        if not self.registry.edges.contains(self.parents, p):
             self.parents.append(p)
 
     def add_parents(self, ps):
@@ -73,7 +136,7 @@ class ControlFlowNode(dict):
         self.calls.append(func)
 
     def add_child(self, c):
-        if c not in self.children:
+        if not self.registry.edges.contains(self.children, c):
             self.children.append(c)
 
     def update_children(self, parents):
@@ -83,11 +146,56 @@ class ControlFlowNode(dict):
 
 class ControlFlow:
 
-    def __init__(self):
-        self.founder = ControlFlowNode(parents=[], ast=ast.parse("start").body[0]) # sentinel
+    def __init__(self, renderer="astor"):
+        """
+        renderer: "astor" (regenerated by astor), "unparse" (regenerated by ast.unparse) or
+                  "segment" (text of the original source code, ast.unparse for generated statements),
+                  "unparse" and "segment" need python 3.9 or later
+        """
+        if renderer in ("unparse", "segment") and not hasattr(ast, "unparse"):
+            raise RuntimeError("renderer %s needs python 3.9 or later (ast.unparse)" % renderer)
+        self.renderer = renderer
+        self.source_code = None
+        self._original = set()
+        self._lines = []
+        self.registry = ControlFlowRegistry()
+        self.founder = self.new_node(parents=[], ast=ast.parse("start").body[0]) # sentinel
         self.founder.ast_node.lineno = 0
         self.functions = {}
         self.functions_node = {}
+        self.graph = None
+        self.module = None
+
+    def new_node(self, parents=[], ast=None):
+        return ControlFlowNode(parents=parents, ast=ast, registry=self.registry, renderer=self.render)
+
+    def render(self, node):
+        if self.renderer == "segment" and id(node) in self._original:
+            segment = self.get_source_segment(node)
+            if segment is not None:
+                return segment.strip()
+        if self.renderer in ("unparse", "segment"):
+            return ast.unparse(node).strip()
+        return render_source(node)
+
+    def get_source_segment(self, node):
+        # as ast.get_source_segment without splitting the source code per call (offsets are utf-8 byte offsets)
+        if getattr(node, "end_lineno", None) is None or getattr(node, "end_col_offset", None) is None:
+            return None
+        lines = self._lines[node.lineno - 1:node.end_lineno]
+        if not lines:
+            return None
+        if len(lines) == 1:
+            return lines[0].encode()[node.col_offset:node.end_col_offset].decode()
+        first = lines[0].encode()[node.col_offset:].decode()
+        last = lines[-1].encode()[:node.end_col_offset].decode()
+        return "".join([first] + lines[1:-1] + [last])
+
+    def render_expression(self, node):
+        # generated statements need the expression in one line
+        if self.renderer in ("unparse", "segment"):
+            return ast.unparse(node).strip()
+        return render_source(node)
 
     def parse(self, src):
         return ast.parse(src)
@@ -116,7 +224,7 @@ class ControlFlow:
         """
          AugAssign(expr target, operator op, expr value)
         """
-        p = [ControlFlowNode(parents=myparents, ast=node)]
+        p = [self.new_node(parents=myparents, ast=node)]
         p = self.walk(node.value, p)
 
         return p
@@ -125,7 +233,7 @@ class ControlFlow:
         """
         AnnAssign(expr target, expr annotation, expr? value, int simple)
         """
-        p = [ControlFlowNode(parents=myparents, ast=node)]
+        p = [self.new_node(parents=myparents, ast=node)]
         p = self.walk(node.value, p)
 
         return p
@@ -137,13 +245,13 @@ class ControlFlow:
         if len(node.targets) > 1:
             raise NotImplementedError("Parallel assignments")
 
-        p = [ControlFlowNode(parents=myparents, ast=node)]
+        p = [self.new_node(parents=myparents, ast=node)]
         p = self.walk(node.value, p)
 
         return p
 
     def on_pass(self, node, myparents):
-        return [ControlFlowNode(parents=myparents, ast=node)]
+        return [self.new_node(parents=myparents, ast=node)]
 
     def on_break(self, node, myparents):
         parent = myparents[0]
@@ -151,7 +259,7 @@ class ControlFlow:
             # we have ordered parents
             parent = parent.parents[0]
         assert hasattr(parent, "exit_nodes")
-        p = ControlFlowNode(parents=myparents, ast=node)
+        p = self.new_node(parents=myparents, ast=node)
 
         # make the break one of the parents of label node.
         parent.exit_nodes.append(p)
@@ -165,7 +273,7 @@ class ControlFlow:
             # we have ordered parents
             parent = parent.parents[0]
         assert hasattr(parent, "exit_nodes")
-        p = ControlFlowNode(parents=myparents, ast=node)
+        p = self.new_node(parents=myparents, ast=node)
 
         # make continue one of the parents of the original test node.
         parent.add_parent(p)
@@ -187,17 +295,17 @@ class ControlFlow:
         #     a = next(__iv)
         #     mystatements
         
-        init_node = ControlFlowNode(parents=myparents, ast=ast.parse("__iv = iter(%s)" % astor.to_source(node.iter).strip()).body[0])
+        init_node = self.new_node(parents=myparents, ast=ast.parse("__iv = iter(%s)" % self.render_expression(node.iter)).body[0])
         ast.copy_location(init_node.ast_node, node.iter)
         
-        _test_node = ControlFlowNode(parents=[init_node], ast=ast.parse("_for: __iv.__length__hint__() > 0").body[0])
+        _test_node = self.new_node(parents=[init_node], ast=ast.parse("_for: __iv.__length__hint__() > 0").body[0])
         ast.copy_location(_test_node.ast_node, node)
 
         # we attach the label node here so that break can find it.
         _test_node.exit_nodes = []
         test_node = self.walk(node.iter, [_test_node])
 
-        extract_node = ControlFlowNode(parents=test_node, ast=ast.parse("%s = next(__iv)" % astor.to_source(node.target).strip()).body[0])
+        extract_node = self.new_node(parents=test_node, ast=ast.parse("%s = next(__iv)" % self.render_expression(node.target)).body[0])
         ast.copy_location(extract_node.ast_node, node.iter)
 
         # now we evaluate the body, one at a time.
@@ -212,7 +320,7 @@ class ControlFlow:
 
     def on_while(self, node, myparents):
         # For a while, the earliest parent is the node.test
-        _test_node = ControlFlowNode(parents=myparents, ast=ast.parse("_while: %s" % astor.to_source(node.test).strip()).body[0])
+        _test_node = self.new_node(parents=myparents, ast=ast.parse("_while: %s" % self.render_expression(node.test)).body[0])
         ast.copy_location(_test_node.ast_node, node.test)
         _test_node.exit_nodes = []
         test_node = self.walk(node.test, [_test_node])
@@ -231,7 +339,7 @@ class ControlFlow:
         return _test_node.exit_nodes + test_node
 
     def on_if(self, node, myparents):
-        _test_node = ControlFlowNode(parents=myparents, ast=ast.parse("_if: %s" % astor.to_source(node.test).strip()).body[0])
+        _test_node = self.new_node(parents=myparents, ast=ast.parse("_if: %s" % self.render_expression(node.test)).body[0])
         ast.copy_location(_test_node.ast_node, node.test)
         test_node = self.walk(node.test, [_test_node])
         g1 = test_node
@@ -285,7 +393,7 @@ class ControlFlow:
         return p
 
     def on_expr(self, node, myparents):
-        p = [ControlFlowNode(parents=myparents, ast=node)]
+        p = [self.new_node(parents=myparents, ast=node)]
         return self.walk(node.value, p)
 
     def on_return(self, node, myparents):
@@ -297,7 +405,7 @@ class ControlFlow:
             parent = parent.parents[0]
         assert hasattr(parent, "return_nodes")
 
-        p = ControlFlowNode(parents=val_node, ast=node)
+        p = self.new_node(parents=val_node, ast=node)
 
         # make the break one of the parents of label node.
         parent.return_nodes.append(p)
@@ -313,10 +421,10 @@ class ControlFlow:
         args = node.args
         returns = node.returns
 
-        enter_node = ControlFlowNode(parents=[], ast=ast.parse("enter: %s(%s)" % (node.name, ", ".join([a.arg for a in node.args.args])) ).body[0]) # sentinel
+        enter_node = self.new_node(parents=[], ast=ast.parse("enter: %s(%s)" % (node.name, ", ".join([a.arg for a in node.args.args])) ).body[0]) # sentinel
         enter_node.calleelink = True
         ast.copy_location(enter_node.ast_node, node)
-        exit_node = ControlFlowNode(parents=[], ast=ast.parse("exit: %s(%s)" % (node.name, ", ".join([a.arg for a in node.args.args])) ).body[0]) # sentinel
+        exit_node = self.new_node(parents=[], ast=ast.parse("exit: %s(%s)" % (node.name, ", ".join([a.arg for a in node.args.args])) ).body[0]) # sentinel
         exit_node.fn_exit_node = True
         ast.copy_location(exit_node.ast_node, node)
         enter_node.return_nodes = []  # sentinel
@@ -348,7 +456,7 @@ class ControlFlow:
         return val
 
     def link_functions(self):
-        for nid,node in ControlFlowRegistry.cache.items():
+        for nid,node in self.registry.cache.items():
             if node.calls:
                 for calls in node.calls:
                     if calls in self.functions:
@@ -376,26 +484,53 @@ class ControlFlow:
                             # #passn.ast_node = exit.ast_node
 
     def update_functions(self):
-        for nid,node in ControlFlowRegistry.cache.items():
+        for nid,node in self.registry.cache.items():
             _n = self.get_defining_function(node)
 
     def update_children(self):
-        for nid,node in ControlFlowRegistry.cache.items():
+        for nid,node in self.registry.cache.items():
             for p in node.parents:
                 p.add_child(node)
 
-    def generate_control_flow(self, src):
+    def generate_control_flow(self, src, link=True):
         node = self.parse(src)
+        # the parsed module (its nodes are kept alive by the control flow nodes anyway)
+        self.module = node
+        self.source_code = src
+        if self.renderer == "segment":
+            # ids of the original ast nodes (the tree is kept alive by the control flow nodes)
+            self._original = {id(n) for n in ast.walk(node)}
+            self._lines = src.splitlines(keepends=True)
         nodes = self.walk(node, [self.founder])
-        self.last_node = ControlFlowNode(parents=nodes, ast=ast.parse("stop").body[0])
+        self.last_node = self.new_node(parents=nodes, ast=ast.parse("stop").body[0])
         ast.copy_location(self.last_node.ast_node, self.founder.ast_node)
         self.update_children()
         self.update_functions()
-        self.link_functions()
+        if link:
+            self.link_functions()
+        self.compact()
+
+    def compact(self):
+        """
+        Build the arrays of the graph (see FlowGraph, node = rid) and drop the membership index used while building
+        """
+        nodes = list(self.registry.cache.values())
+        self.graph = FlowGraph([v.rid for v in nodes],
+                               [[p.rid for p in v.parents] for v in nodes],
+                               [[c.rid for c in v.children] for v in nodes],
+                               {i: v.calls for i, v in enumerate(nodes) if v.calls},
+                               [self.functions_node[v.lineno()] for v in nodes],
+                               [v.lineno() for v in nodes])
+        self.registry.edges.clear()
+        return self.graph
 
 
 # helper functions
 
+def render_source(node):
+    return astor.to_source(node).strip()
+
+
 def read_files(file_names):
     source = ""
     fns = [f.strip() for f in file_names.split(",")] if isinstance(file_names, str) else file_names
@@ -405,12 +540,10 @@ def read_files(file_names):
     return source
 
 
-def generate_control_flow(source_code, remove_start_stop=True):
-    ControlFlowRegistry.reset()
-
-    control_flow = ControlFlow()
+def generate_control_flow(source_code, remove_start_stop=True, renderer="astor"):
+    control_flow = ControlFlow(renderer=renderer)
     control_flow.generate_control_flow(source_code)
-    cache = dict(ControlFlowRegistry.cache)
+    cache = dict(control_flow.registry.cache)
 
     if remove_start_stop:
         return {k:cache[k] for k in cache if cache[k].source() not in {"start", "stop"}}
@@ -418,56 +551,630 @@ def generate_control_flow(source_code, remove_start_stop=True):
     return cache
 
 
-def get_control_flow(file_names):
+def to_csr(adjacency):
+    """Compress a list of neighbour id lists into (offsets, indices) arrays.
+
+       The neighbours of node i are indices[offsets[i]:offsets[i + 1]].
+    """
+    offsets = array("l", [0])
+    indices = array("l")
+    for neighbours in adjacency:
+        indices.extend(neighbours)
+        offsets.append(len(indices))
+    return offsets, indices
+
+
+class FlowGraph(object):
+    """The FlowGraph class.
+
+       Control flow graph with compressed (CSR) adjacency arrays over integer node ids.
+       Node i is labelled nodes[i] (a line number for line level graphs, a rid for node level graphs, see
+       ControlFlow.compact) and located at lines[i]. Parent and child edges are kept separately.
+
+       Example:
+
+       graph, first, last = get_flow_graph("module.py")
+       graph.parents(12)
+       compute_dominator(graph, start=first)
+    """
+
+    def __init__(self, nodes, parents, children, calls=None, functions=None, lines=None, files=None, file_names=None):
+        """Construct a new instance.
+
+           :param nodes: The list of node labels (index = node id).
+           :param parents: The list of parent id lists per node id.
+           :param children: The list of child id lists per node id.
+           :param calls: The optional dictionary with key=node id and value=list of called functions.
+           :param functions: The optional list of defining function names per node id.
+           :param lines: The optional list of line numbers per node id (default is nodes).
+           :param files: The optional list of file indexes (into file_names) per node id of graphs over several files.
+           :param file_names: The optional list of file names.
+        """
+        self.nodes = nodes
+        self.ids = {node: i for i, node in enumerate(nodes)}
+        self.pred_offsets, self.pred_indices = to_csr(parents)
+        self.succ_offsets, self.succ_indices = to_csr(children)
+        self.calls = calls or {}
+        self.functions = functions or [""] * len(nodes)
+        self.lines = array("l", nodes if lines is None else lines)
+        self.files = None if files is None else array("l", files)
+        self.file_names = file_names or []
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def csr(self, key="parents"):
+        """Return the (offsets, indices) arrays of the parent (key="parents") or child (key="children") edges."""
+        return (self.pred_offsets, self.pred_indices) if key == "parents" else (self.succ_offsets, self.succ_indices)
+
+    def parents(self, node):
+        """Return the nodes preceding given node."""
+        i = self.ids[node]
+        return [self.nodes[p] for p in self.pred_indices[self.pred_offsets[i]:self.pred_offsets[i + 1]]]
+
+    def children(self, node):
+        """Return the nodes succeeding given node."""
+        i = self.ids[node]
+        return [self.nodes[c] for c in self.succ_indices[self.succ_offsets[i]:self.succ_offsets[i + 1]]]
+
+    def to_json(self):
+        """Return the graph in json format (dict, node labels must be numbers or strings)."""
+        return {"nodes": self.nodes,
+                "parents": [list(self.pred_indices[self.pred_offsets[i]:self.pred_offsets[i + 1]]) for i in range(len(self))],
+                "children": [list(self.succ_indices[self.succ_offsets[i]:self.succ_offsets[i + 1]]) for i in range(len(self))],
+                "calls": {str(i): c for i, c in self.calls.items()},
+                "functions": self.functions,
+                "lines": list(self.lines)}
+
+    @staticmethod
+    def from_json(data):
+        """Create a graph from its json format (see to_json)."""
+        return FlowGraph(data["nodes"], data["parents"], data["children"], {int(i): c for i, c in data["calls"].items()},
+                         data["functions"], data["lines"])
+
+    def to_dict(self):
+        """Return the graph as dictionary with key=node and value=dict(parents, children[, calls], function)."""
+        g = {}
+        for i, node in enumerate(self.nodes):
+            g[node] = {"parents": set(self.parents(node)), "children": set(self.children(node))}
+            if i in self.calls:
+                g[node]["calls"] = self.calls[i]
+            g[node]["function"] = self.functions[i]
+        return g
+
+    def to_lines(self, skip=None):
+        """Merge the nodes of each line in one linear pass over the arrays.
+
+           :param skip: The optional set of (node id, parent id) edges to be left out.
+
+           :returns: The line level FlowGraph (edges within a line are dropped).
+        """
+        ids = {}
+        lines = []
+        line_ids = array("l")
+        # lines of graphs over several files are (file index, line)
+        for line in self.lines if self.files is None else zip(self.files, self.lines):
+            if line not in ids:
+                ids[line] = len(lines)
+                lines.append(line)
+            line_ids.append(ids[line])
+
+        parents = [set() for _ in lines]
+        children = [set() for _ in lines]
+        functions = [""] * len(lines)
+        for i, at in enumerate(line_ids):
+            parents[at].update(line_ids[p] for p in self.pred_indices[self.pred_offsets[i]:self.pred_offsets[i + 1]]
+                               if not skip or (i, p) not in skip)
+            children[at].update(line_ids[c] for c in self.succ_indices[self.succ_offsets[i]:self.succ_offsets[i + 1]]
+                                if not skip or (c, i) not in skip)
+            functions[at] = self.functions[i]
+        # the calls of the last node of a line with calls
+        calls = {line_ids[i]: c for i, c in sorted(self.calls.items())}
+
+        for i in range(len(lines)):
+            # remove dummy nodes
+            parents[i].discard(i)
+            children[i].discard(i)
+
+        parents = [sorted(ps) for ps in parents]
+        children = [sorted(cs) for cs in children]
+        if self.files is None:
+            return FlowGraph(lines, parents, children, calls, functions)
+        return FlowGraph([(self.file_names[f], line) for f, line in lines], parents, children, calls, functions,
+                         [line for _, line in lines], [f for f, _ in lines], self.file_names)
+
+
+def build_flow_graph(control_flow):
+    """Build the line level graph of a generated ControlFlow.
+
+       :returns: The FlowGraph (edges within a line are dropped).
+    """
+    graph = control_flow.graph if control_flow.graph is not None else control_flow.compact()
+    return graph.to_lines()
+
+
+def get_flow_graph(file_names):
     control_flow = ControlFlow()
     control_flow.generate_control_flow(read_files(file_names))
-    cache = ControlFlowRegistry.cache
-    g = {}
-    for k, v in cache.items():
-        j = v.to_json()
-        at = j["at"]
-        parents_at = [cache[p].to_json()["at"] for p in j["parents"]]
-        children_at = [cache[c].to_json()["at"] for c in j["children"]]
-        if at not in g:
-            g[at] = {"parents": set(), "children": set()}
-        # remove dummy nodes
-        ps = set([p for p in parents_at if p != at])
-        cs = set([c for c in children_at if c != at])
-        g[at]["parents"] |= ps
-        g[at]["children"] |= cs
-        if v.calls:
-            g[at]["calls"] = v.calls
-        g[at]["function"] = control_flow.functions_node[v.lineno()]
-    return (g, control_flow.founder.ast_node.lineno, control_flow.last_node.ast_node.lineno)
-
-
-def compute_dominator(control_flow, start=0, key="parents"):
-    dominator = {}
-    dominator[start] = {start}
-    all_nodes = set(control_flow.keys())
-    rem_nodes = all_nodes - {start}
-    for n in rem_nodes:
-        dominator[n] = all_nodes
-
-    c = True
-    while c:
-        c = False
-        for n in rem_nodes:
-            pred_n = control_flow[n][key]
-            doms = [dominator[p] for p in pred_n]
-            i = set.intersection(*doms) if doms else set()
-            v = {n} | i
-            if dominator[n] != v:
-                c = True
-            dominator[n] = v
-    return dominator
+    return (build_flow_graph(control_flow), control_flow.founder.ast_node.lineno, control_flow.last_node.ast_node.lineno)
+
+
+def get_control_flow(file_names):
+    graph, first, last = get_flow_graph(file_names)
+    return (graph.to_dict(), first, last)
+
+
+def compute_idom(offsets, indices, roots):
+    """Compute immediate dominators (Cooper, Harvey, Kennedy: A Simple, Fast Dominance Algorithm).
+
+       Nodes are integer ids 0..n-1, the predecessors of node i are indices[offsets[i]:offsets[i + 1]] (see to_csr).
+       A virtual root (id n) precedes all roots, so graphs with several entry nodes are handled as well
+       (predecessors of roots are ignored).
+
+       :returns: The tuple (idom, rpo) of the immediate dominator per node (n for roots, -1 if unreachable)
+                 and the node ids in reverse postorder starting with the virtual root.
+    """
+    num = len(offsets) - 1
+    succs = [[] for _ in range(num + 1)]
+    for n in range(num):
+        for p in indices[offsets[n]:offsets[n + 1]]:
+            succs[p].append(n)
+    succs[num] = list(roots)
+    is_root = bytearray(num + 1)
+    for r in roots:
+        is_root[r] = 1
+
+    # iterative depth first search for the postorder
+    postorder = []
+    visited = bytearray(num + 1)
+    visited[num] = 1
+    stack = [(num, iter(succs[num]))]
+    while stack:
+        node, it = stack[-1]
+        for s in it:
+            if not visited[s]:
+                visited[s] = 1
+                stack.append((s, iter(succs[s])))
+                break
+        else:
+            stack.pop()
+            postorder.append(node)
+
+    po = [-1] * (num + 1)
+    for i, n in enumerate(postorder):
+        po[n] = i
+    rpo = postorder[::-1]
+
+    idom = [-1] * (num + 1)
+    idom[num] = num
+    for r in roots:
+        idom[r] = num
+    changed = True
+    while changed:
+        changed = False
+        for n in rpo[1:]:
+            if is_root[n]:
+                continue
+            new_idom = -1
+            for p in indices[offsets[n]:offsets[n + 1]]:
+                if idom[p] == -1:
+                    continue
+                if new_idom == -1:
+                    new_idom = p
+                    continue
+                # intersect: walk up both fingers until they meet
+                a, b = p, new_idom
+                while a != b:
+                    while po[a] < po[b]:
+                        a = idom[a]
+                    while po[b] < po[a]:
+                        b = idom[b]
+                new_idom = a
+            if idom[n] != new_idom:
+                idom[n] = new_idom
+                changed = True
+
+    return idom, rpo
+
+
+class DominatorTree(Mapping):
+    """Dominator tree of a control flow graph.
+
+       Maps each node to the set of its dominators (computed on demand from the immediate dominators),
+       so it can be used like a dictionary of dominator sets.
+    """
+
+    def __init__(self, nodes, idom, ids=None):
+        self.nodes = nodes
+        self.ids = ids if ids is not None else {n: i for i, n in enumerate(nodes)}
+        self._idom = idom
+        self._intervals = None
+
+    def __getitem__(self, node):
+        i = self.ids[node]
+        if self._idom[i] == -1:
+            # not reachable from any entry node
+            return set(self.nodes)
+        num = len(self.nodes)
+        dominators = set()
+        while i != num:
+            dominators.add(self.nodes[i])
+            i = self._idom[i]
+        return dominators
+
+    def __iter__(self):
+        return iter(self.nodes)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def idom(self, node):
+        """Return the immediate dominator of node (None for entry nodes and unreachable nodes)."""
+        i = self._idom[self.ids[node]]
+        return None if i in (-1, len(self.nodes)) else self.nodes[i]
+
+    def children(self, node):
+        """Return the nodes immediately dominated by node."""
+        return self.tree.get(node, [])
+
+    @property
+    def tree(self):
+        """The dominator tree as dictionary with key=node and value=list of immediately dominated nodes."""
+        tree = {}
+        for i, n in enumerate(self.nodes):
+            d = self._idom[i]
+            if d not in (-1, len(self.nodes)):
+                tree.setdefault(self.nodes[d], []).append(n)
+        return tree
+
+    def dominates(self, a, b):
+        """Return True if a dominates b (in constant time once the tree is numbered)."""
+        if self._intervals is None:
+            self._intervals = self._number()
+        i, j = self.ids[a], self.ids[b]
+        if self._idom[j] == -1:
+            return True
+        if self._idom[i] == -1:
+            return False
+        return self._intervals[i][0] <= self._intervals[j][0] and self._intervals[j][1] <= self._intervals[i][1]
+
+    def _number(self):
+        num = len(self.nodes)
+        children = [[] for _ in range(num + 1)]
+        for i, d in enumerate(self._idom[:num]):
+            if d != -1:
+                children[d].append(i)
+        intervals = [None] * (num + 1)
+        counter = 0
+        stack = [(num, False)]
+        while stack:
+            i, done = stack.pop()
+            if done:
+                intervals[i] = (intervals[i], counter)
+                counter += 1
+                continue
+            intervals[i] = counter
+            counter += 1
+            stack.append((i, True))
+            stack.extend((c, False) for c in children[i])
+        return intervals
+
+
+def compute_dominator(control_flow, start=0, key="parents", roots=None):
+    """Compute the dominators (key="parents") or post-dominators (key="children", start=exit) of a control flow graph.
+
+       The graph is a FlowGraph (used as is) or a dictionary with key=node and value=dict(parents, children).
+       The optional roots and nodes without predecessors are treated as further entry nodes (they are dominated by
+       themselves only), e.g. the start (or stop) nodes of all files of get_file_flow_graph.
+
+       :returns: The DominatorTree mapping each node to the set of its dominators.
+    """
+    if isinstance(control_flow, FlowGraph):
+        nodes, ids = control_flow.nodes, control_flow.ids
+        offsets, indices = control_flow.csr(key)
+        if start not in ids:
+            nodes, ids = nodes + [start], {**ids, start: len(nodes)}
+            offsets = offsets + array("l", [offsets[-1]])
+    else:
+        nodes = list(control_flow.keys())
+        if start not in control_flow:
+            nodes.append(start)
+        ids = {n: i for i, n in enumerate(nodes)}
+        offsets, indices = to_csr([[ids[p] for p in control_flow[n][key] if p in ids] if n in control_flow else [] for n in nodes])
+
+    s = ids[start]
+    extra = {ids[r] for r in roots or [] if r in ids}
+    roots = [s] + [i for i in range(len(nodes)) if (i in extra or offsets[i] == offsets[i + 1]) and i != s]
+
+    idom, _ = compute_idom(offsets, indices, roots)
+    return DominatorTree(nodes, idom, ids)
 
 
 def compute_flow(file_names):
-    control_flow, first, last = get_control_flow(file_names)
-    return control_flow, compute_dominator(
-        control_flow, start=first), compute_dominator(
-            control_flow, start=last, key="children")
+    graph, first, last = get_flow_graph(file_names)
+    return graph.to_dict(), compute_dominator(
+        graph, start=first), compute_dominator(
+            graph, start=last, key="children")
+
+
+# per file mode
+
+def decode_source(content):
+    """Decode python source bytes like the interpreter does (utf-8 unless another encoding is declared)."""
+    encoding, _ = tokenize.detect_encoding(io.BytesIO(content).readline)
+    return content.decode(encoding)
+
+
+def build_file_graph(file_name, source_code=None):
+    """Parse and walk one file without linking functions (runs in a worker process of get_file_flow_graph).
+
+       :param file_name: The python file name.
+       :param source_code: The optional content of the file (default is read from the file).
+
+       :returns: The tuple (node level FlowGraph, dict with key=function name and value=(enter id, exit id),
+                 start id, stop id, imports (see get_imports)).
+    """
+    if source_code is None:
+        with open(file_name, "rb") as f:
+            source_code = decode_source(f.read())
+    control_flow = ControlFlow()
+    control_flow.generate_control_flow(source_code, link=False)
+    functions = {name: (enter.rid, exit.rid) for name, (enter, exit) in control_flow.functions.items()}
+    return control_flow.graph, functions, control_flow.founder.rid, control_flow.last_node.rid, get_imports(control_flow.module)
+
+
+def get_imports(tree):
+    """Return the names a module imports.
+
+       :param tree: The ast of the module.
+
+       :returns: The tuple (dict with key=local name and value=(last part of module name or None, imported name),
+                 sorted list of last parts of imported module names). Names imported from a package may be modules too.
+    """
+    names, modules = {}, set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules.update(alias.name.rsplit(".", 1)[-1] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            module = node.module.rsplit(".", 1)[-1] if node.module else None
+            for alias in node.names:
+                names[alias.asname or alias.name] = (module, alias.name)
+                modules.add(alias.name)
+    return names, sorted(modules)
+
+
+def module_name(file_name):
+    """Return the module name of a python file (the package name for __init__.py)."""
+    name = os.path.splitext(os.path.basename(file_name))[0]
+    return os.path.basename(os.path.dirname(os.path.abspath(file_name))) if name == "__init__" else name
+
+
+def merge_file_graphs(file_names, file_graphs):
+    """Merge the node level graphs of several files and link function calls across files.
+
+       Calls are linked as in ControlFlow.link_functions, but only to a function of the same file, a function imported
+       by name (from ... import ...) or a function of an imported module (first match in this order). Modules are
+       matched by the last part of their name (see module_name).
+
+       :param file_names: The list of file names.
+       :param file_graphs: The list of results of build_file_graph per file.
+
+       :returns: The tuple (node level FlowGraph with nodes (file name, rid), list of start ids, list of stop ids,
+                 set of (node id, exit id) edges returning from a function of another file).
+                 The stop nodes are at line -1, so they aren't merged with the start nodes (line 0) by to_lines.
+    """
+    nodes, parents, children, lines, files = [], [], [], [], []
+    calls, functions, definitions, imports = {}, [], [], []
+    starts, stops = [], []
+    for f, (file_name, (graph, defs, start, stop, imported)) in enumerate(zip(file_names, file_graphs)):
+        base = len(nodes)
+        for i, rid in enumerate(graph.nodes):
+            nodes.append((file_name, rid))
+            parents.append([base + p for p in graph.pred_indices[graph.pred_offsets[i]:graph.pred_offsets[i + 1]]])
+            children.append([base + c for c in graph.succ_indices[graph.succ_offsets[i]:graph.succ_offsets[i + 1]]])
+        lines.extend(graph.lines)
+        files.extend([f] * len(graph))
+        functions.extend(graph.functions)
+        calls.update((base + i, c) for i, c in graph.calls.items())
+        definitions.append({name: (base + enter, base + exit) for name, (enter, exit) in defs.items()})
+        imports.append(imported)
+        starts.append(base + graph.ids[start])
+        stops.append(base + graph.ids[stop])
+        lines[stops[-1]] = -1
+
+    # membership sets of the parent lists touched by linking
+    members = {}
+
+    def add_parent(node, parent):
+        if node not in members:
+            members[node] = set(parents[node])
+        if parent not in members[node]:
+            members[node].add(parent)
+            parents[node].append(parent)
+
+    files_of_module = {}
+    for f, file_name in enumerate(file_names):
+        files_of_module.setdefault(module_name(file_name), []).append(f)
+
+    def resolve(f, name):
+        if name in definitions[f]:
+            return definitions[f][name]
+        names, modules = imports[f]
+        if name in names:
+            module, imported = names[name]
+            for g in files_of_module.get(module, []):
+                if imported in definitions[g]:
+                    return definitions[g][imported]
+        for module in modules:
+            for g in files_of_module.get(module, []):
+                if name in definitions[g]:
+                    return definitions[g][name]
+        return None
+
+    returns = set()
+    for node in sorted(calls):
+        for call in calls[node]:
+            definition = resolve(files[node], call)
+            if definition is not None:
+                enter, exit = definition
+                add_parent(enter, node)
+                for child in children[node]:
+                    add_parent(child, exit)
+                    if files[exit] != files[child]:
+                        returns.add((child, exit))
+
+    graph = FlowGraph(nodes, parents, children, calls, functions, lines, files, list(file_names))
+    return graph, starts, stops, returns
+
+
+class ControlFlowCache(object):
+    """The ControlFlowCache class.
+
+       Stores the per file graphs (see build_file_graph) as json files in a folder, keyed by the sha256 of
+       the analyzer version and the file content. Unchanged files aren't parsed again, even if they were moved.
+       Entries are never evicted implicitly, prune removes the ones not used since the instance was created.
+
+       Example:
+
+       cache = ControlFlowCache(".controlflow")
+       graph, first, last = get_file_flow_graph(glob.glob("src/**/*.py", recursive=True), cache=cache)
+       print(cache.hits, cache.misses)
+       cache.prune()
+    """
+
+    def __init__(self, path):
+        """Construct a new instance.
+
+           :param path: The cache folder (created if needed).
+        """
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.seen = set()
+        os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def key(content):
+        """Return the cache key of a file content (bytes)."""
+        return hashlib.sha256(ANALYZER_VERSION.encode() + b"\0" + content).hexdigest()
+
+    def get(self, key):
+        """Return the stored file graph (see build_file_graph) or None."""
+        self.seen.add(key)
+        try:
+            with open(os.path.join(self.path, key + ".json"), "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        if data.get("version") != ANALYZER_VERSION:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return (FlowGraph.from_json(data["graph"]), {name: tuple(ids) for name, ids in data["definitions"].items()},
+                data["start"], data["stop"], ({name: tuple(v) for name, v in data["imports"][0].items()}, data["imports"][1]))
+
+    def set(self, key, file_graph):
+        """Store a file graph (atomically)."""
+        graph, definitions, start, stop, imports = file_graph
+        self.seen.add(key)
+        filename = os.path.join(self.path, "{0}.{1}.tmp".format(key, os.getpid()))
+        with open(filename, "w") as f:
+            json.dump({"version": ANALYZER_VERSION, "graph": graph.to_json(), "definitions": definitions, "start": start, "stop": stop,
+                       "imports": imports}, f)
+        os.replace(filename, os.path.join(self.path, key + ".json"))
+
+    def clear(self):
+        """Remove all stored file graphs."""
+        for name in os.listdir(self.path):
+            if name.endswith(".json"):
+                os.remove(os.path.join(self.path, name))
+
+    def prune(self):
+        """Remove the stored file graphs not used since the instance was created (e.g. of deleted or changed files).
+
+           :returns: The number of removed file graphs.
+        """
+        count = 0
+        for name in os.listdir(self.path):
+            if name.endswith(".json") and name[:-5] not in self.seen:
+                try:
+                    os.remove(os.path.join(self.path, name))
+                    count += 1
+                except OSError:
+                    pass
+        return count
+
+
+def merge_files(file_names, max_workers=None, cache=None):
+    """Build the node level graphs of several files (in worker processes or from the cache) and merge them.
+
+       :returns: The tuple (list of file names, results of merge_file_graphs).
+    """
+    fns = [f.strip() for f in file_names.split(",") if f.strip()] if isinstance(file_names, str) else list(file_names)
+    if not fns:
+        raise ValueError("no file names given")
+    cache = ControlFlowCache(cache) if isinstance(cache, str) else cache
+
+    file_graphs = [None] * len(fns)
+    sources = [None] * len(fns)
+    keys = [None] * len(fns)
+    if cache is not None:
+        for i, fn in enumerate(fns):
+            with open(fn, "rb") as f:
+                content = f.read()
+            keys[i] = cache.key(content)
+            file_graphs[i] = cache.get(keys[i])
+            if file_graphs[i] is None:
+                # parse the hashed content (the file may change meanwhile)
+                sources[i] = decode_source(content)
+
+    missing = [i for i, file_graph in enumerate(file_graphs) if file_graph is None]
+    if len(missing) <= 1 or max_workers == 1:
+        built = [build_file_graph(fns[i], sources[i]) for i in missing]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            built = list(executor.map(build_file_graph, [fns[i] for i in missing], [sources[i] for i in missing]))
+
+    for i, file_graph in zip(missing, built):
+        file_graphs[i] = file_graph
+        if cache is not None:
+            cache.set(keys[i], file_graph)
+
+    return fns, merge_file_graphs(fns, file_graphs)
+
+
+def get_file_flow_graph(file_names, max_workers=None, cache=None):
+    """Build the line level graph of several files, each file is parsed and walked in a worker process.
+
+       Unlike get_flow_graph the files aren't concatenated, nodes are identified by (file name, line).
+       With a cache only new or changed files are parsed, the functions of all files are linked again
+       (a linear pass over the cached arrays).
+
+       :param file_names: The python file names (list or comma separated, ValueError if empty).
+       :param max_workers: The max number of worker processes (default is the number of processors).
+       :param cache: The optional ControlFlowCache instance or cache folder path.
+
+       :returns: The tuple (line level FlowGraph, list of start nodes (file name, 0), list of stop nodes (file name, -1))
+                 with one start and stop node per file.
+    """
+    fns, (graph, _, _, _) = merge_files(file_names, max_workers, cache)
+    return graph.to_lines(), [(fn, 0) for fn in fns], [(fn, -1) for fn in fns]
+
+
+def compute_file_flow(file_names, max_workers=None, cache=None):
+    """Compute the line level graph (see get_file_flow_graph), dominators and post-dominators of several files.
+
+       The start nodes of all files are entry nodes, the stop nodes of all files are exit nodes. The dominators are
+       computed without the edges returning from functions of other files (the call keeps its edge to the next
+       statement), so the statements of a file are dominated by its start node, not by the functions it calls.
+    """
+    fns, (graph, _, _, returns) = merge_files(file_names, max_workers, cache)
+    lines = graph.to_lines()
+    starts, stops = [(fn, 0) for fn in fns], [(fn, -1) for fn in fns]
+    return lines.to_dict(), compute_dominator(
+        graph.to_lines(skip=returns), start=starts[0], roots=starts), compute_dominator(
+            lines, start=stops[-1], key="children", roots=stops)
 
 
 def generate_graph(cache, arcs=[]):
@@ -479,6 +1186,7 @@ def generate_graph(cache, arcs=[]):
     kind = {-1: None, 0: "true", 1: "false"}
     graph = graphviz.Digraph(strict=False)
     cov_lines = set(i for i, j in arcs)
+    orders = {}
     for nid, cnode in cache.items():
         lineno = cnode.lineno()
         shape, peripheries = "oval", "1"
@@ -495,7 +1203,7 @@ def generate_graph(cache, arcs=[]):
         for pn in cnode.parents:
             plineno = pn.lineno()
             if hasattr(pn, "calllink") and pn.calllink > 0 and not hasattr(cnode, "calleelink"):
-                graph.edge(str(pn.rid), str(cnode.rid), style="dotted", weight=100)
+                graph.edge(str(pn.rid), str(cnode.rid), style="dotted", weight="100")
                 continue
 
             if arcs:
@@ -512,7 +1220,9 @@ def generate_graph(cache, arcs=[]):
                 else:
                     graph.edge(str(pn.rid), str(cnode.rid), color="red")
             else:
-                order = {c.rid: rid for rid,c in enumerate(pn.children)}
+                if pn.rid not in orders:
+                    orders[pn.rid] = {c.rid: rid for rid,c in enumerate(pn.children)}
+                order = orders[pn.rid]
                 if len(order) < 2:
                     graph.edge(str(pn.rid), str(cnode.rid))
                 else:
@@ -529,9 +1239,10 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--input", required=True, help="python files(s) to be parsed (comma separated)")
     parser.add_argument("--output", required=True, help="output file")
+    parser.add_argument("--renderer", default="astor", choices=["astor", "unparse", "segment"], help="source rendering of the nodes")
 
     args = parser.parse_args()
 
-    cfg = generate_control_flow(read_files(args.input))
+    cfg = generate_control_flow(read_files(args.input), renderer=args.renderer)
     graph = generate_graph(cfg)
     graph.render(args.output, format="pdf", cleanup=True)
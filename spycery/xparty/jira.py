@@ -3,16 +3,243 @@
 
 """This module provides functionality for JIRA interaction."""
 
-from datetime import datetime, timedelta
+import bisect
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import gzip
 import json
 import logging
+import os
+import re
 import requests
 import requests_toolbelt
+import threading
+import time
 import urllib.parse
+import weakref
 
 from spycery.extensions.datetime_extensions import DateTimeExtensions as dte
 
 
+def _normalize_columns(columns):
+    """Return the column dictionary for given column names, field paths or dictionary."""
+    if isinstance(columns, str):
+        columns = [c.strip() for c in columns.split(",")]
+    if not isinstance(columns, dict):
+        columns = {c: c for c in (columns or ["key"])}
+    return columns
+
+
+def _fields_of_columns(columns):
+    """Return the comma separated list of fields needed to resolve the field paths of given columns."""
+    fields = []
+    for path in columns.values():
+        parts = path.split(".")
+        if len(parts) > 1 and parts[0] == "fields" and parts[1] not in fields:
+            fields.append(parts[1])
+    return ",".join(fields) or "key"
+
+
+def _get_path(data, path):
+    """Return the value at the dotted path of nested json data (e.g. "fields.status.name") or None."""
+    for part in path.split("."):
+        if isinstance(data, dict):
+            data = data.get(part)
+        elif isinstance(data, list) and part.lstrip("-").isdigit() and -len(data) <= int(part) < len(data):
+            data = data[int(part)]
+        else:
+            return None
+    return data
+
+
+def plan_search(search_mask="", start_date=None, end_date=None, date_field="created", authors=None, author_field="worklogAuthor"):
+    """Return the search mask (JQL string) restricted to given time window and authors.
+
+        The date bounds are widened by one day on each side to be safe regarding time zones,
+        so callers still have to filter the results exactly, but only candidate issues are transferred.
+
+        Example:
+
+        plan_search("project = ABC", datetime(2020, 1, 1), datetime(2020, 1, 31), "worklogDate", ["john.doe"])
+        -> (project = ABC) AND worklogDate >= "2019-12-31" AND worklogDate < "2020-02-02" AND worklogAuthor in ("john.doe")
+
+        :param str search_mask: The JQL string used to search for issues.
+        :param date start_date: The optional start of the time window (datetime.min for unbounded).
+        :param date end_date: The optional end of the time window (datetime.max for unbounded).
+        :param str date_field: The JQL date field to be restricted (e.g. "created", "worklogDate").
+        :param authors: The optional list of authors (user names) to be restricted.
+        :param str author_field: The JQL user field to be restricted (e.g. "worklogAuthor", "reporter").
+
+        :returns: The JQL string.
+        :rtype: str
+    """
+    # an ORDER BY clause needs to stay at the end (quoted strings are skipped, they may contain "order by" as well)
+    search_mask = search_mask or ""
+    order_by = ""
+    for match in re.finditer(r"\"(?:[^\"\\]|\\.)*\"|'(?:[^'\\]|\\.)*'|(\s*\border\s+by\b)", search_mask, flags=re.IGNORECASE | re.DOTALL):
+        if match.group(1):
+            search_mask, order_by = search_mask[:match.start()], search_mask[match.start():]
+            break
+
+    clauses = ["({0})".format(search_mask)] if search_mask.strip() else []
+    if start_date is not None and start_date > datetime.min + timedelta(days=1):
+        clauses.append("{0} >= \"{1}\"".format(date_field, (start_date - timedelta(days=1)).strftime("%Y-%m-%d")))
+    if end_date is not None and end_date < datetime.max - timedelta(days=2):
+        clauses.append("{0} < \"{1}\"".format(date_field, (end_date + timedelta(days=2)).strftime("%Y-%m-%d")))
+    if authors:
+        clauses.append("{0} in ({1})".format(author_field, ", ".join(json.dumps(author) for author in authors)))
+
+    return " ".join(part for part in (" AND ".join(clauses), order_by.strip()) if part)
+
+
+def _sum_worklogs(issues, start_date=datetime.min, end_date=datetime.max, users=None):
+    """Return the worklog dictionary with key=author and value=hours of given issues within the time window."""
+    issues_worklog = {}
+    for issue in issues:
+        for worklog in issue["fields"]["worklog"]["worklogs"]:
+            if worklog["author"].get("emailAddress") is not None:
+                user = (worklog["author"]["emailAddress"]).split("@")[0].lower()
+                if users and user not in users:
+                    continue
+                updated = datetime.strptime(worklog["updated"].split("T")[0], "%Y-%m-%d")  # T%H:%M:%S.%f")
+                if (updated >= start_date) and (updated <= end_date):
+                    issues_worklog.setdefault(user, []).append(worklog["timeSpentSeconds"])
+    return {k: sum(v) / 3600 for k, v in issues_worklog.items()}
+
+
+def _get_board_id(boards, board):
+    """Return the id of the board with given name within the list of boards or -1 if not found."""
+    for bd in boards:
+        if bd["name"] == board:
+            return bd["id"]
+    return -1
+
+
+def _sprint_name(board, sprint):
+    """Return the unique name of a sprint within a board (e.g. "Board Sprint 1 (2017-02-13, 2017-02-26)")."""
+    return "{} {} ({}, {})".format(board, sprint["name"], sprint["startDate"].split("T")[0], sprint["endDate"].split("T")[0])
+
+
+def _sprint_worklog_search(sprint):
+    """Return the get_issues_worklog arguments for searching the worklog of a sprint."""
+    return {"search_mask": "sprint=%d" % sprint["id"],
+            "start_date": datetime.strptime(sprint["startDate"].split("T")[0], "%Y-%m-%d"),  # T%H:%M:%S.%f"),
+            "end_date": datetime.strptime(sprint["endDate"].split("T")[0], "%Y-%m-%d")}  # T%H:%M:%S.%f"))
+
+
+def _build_sprint_worklog(board, sprints, worklogs, users=None):
+    """Return the nested worklog dictionary with key1=sprint key2=author and value=hours of given sprints and their worklogs."""
+    logged_users = []
+    worklog = {}
+
+    for sprint, issues_worklog in zip(sprints, worklogs):
+        logged_users.extend([user for user in issues_worklog if user not in logged_users])
+
+        # build sprint statistic
+        sprint_name = _sprint_name(board, sprint)
+        worklog[sprint_name] = {}
+        for user in (users or issues_worklog):
+            worklog[sprint_name][user] = issues_worklog[user] if user in issues_worklog else 0.0
+
+    # fill gaps
+    if not users:
+        for sprint_name in worklog:
+            for user in logged_users:
+                if user not in worklog[sprint_name]:
+                    worklog[sprint_name][user] = 0.0
+
+    return worklog
+
+
+def _parse_timestamp(value):
+    """Return the timezone aware datetime of a jira timestamp (e.g. 2017-02-17T10:00:00.000+0100)."""
+    return datetime.strptime(value, "%Y-%m-%dT%H:%M:%S.%f%z")
+
+
+def _status_periods(issue, histories, until):
+    """Return the list of (status, entered, left) tuples of an issue by its changelog histories (list or future of list)."""
+    if isinstance(histories, Future):
+        histories = histories.result()
+
+    transitions = []
+    for history in histories:
+        for item in history.get("items") or []:
+            if item.get("field") == "status":
+                transitions.append((_parse_timestamp(history["created"]), item.get("fromString"), item.get("toString")))
+    transitions.sort(key=lambda t: t[0])
+
+    fields = issue.get("fields") or {}
+    entered = _parse_timestamp(fields["created"]) if fields.get("created") else (transitions[0][0] if transitions else until)
+    status = transitions[0][1] if transitions else (fields.get("status") or {}).get("name")
+
+    periods = []
+    for date, _, to_status in transitions:
+        periods.append((status, entered, date))
+        status, entered = to_status, date
+    periods.append((status, entered, max(entered, until)))
+    return periods
+
+
+class PageSizer(object):
+    """The PageSizer class.
+
+       Adapts the page size of paginated searches to the server's effective maxResults cap
+       and to the observed latency and payload size per issue (which depend on requested fields and expansions).
+    """
+
+    def __init__(self, page_size=1000, min_page_size=10, target_time=2.0, target_bytes=8 * 1024 * 1024):
+        """Construct a new instance.
+
+            :param int page_size: The initial (and max) page size to be requested.
+            :param int min_page_size: The min page size to be requested.
+            :param float target_time: The targeted response time per page in seconds.
+            :param int target_bytes: The targeted payload size per page in bytes.
+        """
+        self.page_size = page_size
+        self.max_page_size = page_size
+        self.min_page_size = min(min_page_size, page_size)
+        self.target_time = target_time
+        self.target_bytes = target_bytes
+        self.server_cap = None
+        # the sizer of a search is shared by threads running searches concurrently
+        self._lock = threading.Lock()
+
+    def update(self, requested, response, elapsed, size=None):
+        """Update the page size by the response of a page request.
+
+            :param int requested: The number of issues requested.
+            :param response: The json data of the search response.
+            :param float elapsed: The response time in seconds.
+            :param int size: The optional payload size in bytes.
+
+            :returns: The page size to be requested next.
+            :rtype: int
+        """
+        received = len(response.get("issues") or [])
+        remaining = response.get("total", 0) - response.get("startAt", 0)
+
+        # servers silently cap maxResults but report the effective value
+        cap = response.get("maxResults")
+        if not isinstance(cap, int) or cap <= 0 or cap >= requested:
+            cap = received if 0 < received < min(requested, remaining) else None
+
+        with self._lock:
+            if cap is not None:
+                self.server_cap = cap if self.server_cap is None else min(self.server_cap, cap)
+                self.max_page_size = min(self.max_page_size, self.server_cap)
+
+            page_size = self.page_size
+            if received > 0:
+                ideal = self.target_time / max(elapsed / received, 1e-6)
+                if size:
+                    ideal = min(ideal, self.target_bytes / (size / received))
+                # grow smoothly, shrink immediately
+                page_size = int(min(ideal, 2 * requested))
+
+            self.page_size = max(self.min_page_size, min(page_size, self.max_page_size))
+            return self.page_size
+
+
 class Jira(object):
     """The Jira class.
 
@@ -37,8 +264,35 @@ class Jira(object):
         self.authentication = requests.auth.HTTPBasicAuth(username, password)
         self.headers = {"Accept": "application/json", "Content-type": "application/json"}
         self.methods = {"GET", "POST", "PUT", "DELETE"}
+        self.issues_per_page = 1000
+        self.page_sizes = {}  # learned page sizes by (fields, expand)
         self.logger = logging.getLogger(self.__class__.__name__)
         self.logger.debug("__init__(\"%s\", \"%s\", \"%s\")", server, "XXXXXXXX", "XXXXXXXX")
+        self._local = threading.local()
+        self._sessions = weakref.WeakSet()  # the sessions of all threads (dropped with their thread)
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        """The requests session of the calling thread (keeps connections alive, sessions aren't thread safe)."""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            with self._lock:
+                self._sessions.add(session)
+        return session
+
+    def close(self):
+        """Close the connections of all threads."""
+        with self._lock:
+            sessions = list(self._sessions)
+        for session in sessions:
+            session.close()
+
+    @property
+    def last_error(self):
+        """The error which stopped the last page iteration (see iter_issue_pages) of the calling thread or None."""
+        return getattr(self._local, "last_error", None)
 
     def _make_request(self, method, path="", **kwargs):
         """Make a request call to path.
@@ -63,13 +317,14 @@ class Jira(object):
 
         try:
             headers = {**self.headers, **headers}
-            response = requests.request(method,
-                                        "{0}/{1}".format(self.server, path),
-                                        auth=self.authentication,
-                                        headers=headers,
-                                        data=data,
-                                        **kwargs)
+            response = self.session.request(method,
+                                            "{0}/{1}".format(self.server, path),
+                                            auth=self.authentication,
+                                            headers=headers,
+                                            data=data,
+                                            **kwargs)
             response.raise_for_status()
+            self._local.response_size = len(response.content)
             result = {} if not response.text else response.json()
         except requests.exceptions.RequestException as ex:
             self.logger.debug("request failed. %s", ex)
@@ -202,31 +457,263 @@ class Jira(object):
                                               urllib.parse.quote_plus(expand or "")))
         return response
 
-    def get_all_issues(self, search_mask="", fields=None, expand=None):
-        """Return the list of all issue data matching the search mask (JQL string).
+    def iter_issues(self, search_mask="", fields=None, expand=None, index=0):
+        """Iterate over all issue data matching the search mask (JQL string) page by page.
+
+            Only the current page is kept in memory, so this is the preferred way to process large result sets.
 
             :param str search_mask: The JQL string used to search for issues.
             :param str fields: Comma separated list of fields to be returned.
+            :param str expand: Comma separated list of entities to be expanded.
+            :param int index: The index to start from.
 
-            :returns: The list of all issue data.
+            :returns: Generator of issue data.
         """
-        number_of_issues = self.get_issues(search_mask=search_mask, index=None, count=None)["total"]
+        for _, issues in self.iter_issue_pages(search_mask=search_mask, fields=fields, expand=expand, index=index):
+            yield from issues
 
-        issues = []
-        # visit all issues in blocks of 1000 (there's no way to get them all at once)
-        issues_per_page = 1000
-        i = 0
-        while i < number_of_issues:
+    def iter_issue_pages(self, search_mask="", fields=None, expand=None, index=0):
+        """Iterate over the pages of issue data matching the search mask (JQL string).
+
+            A failed request stops the iteration, the error is kept in last_error (None if all pages were read).
+
+            :param str search_mask: The JQL string used to search for issues.
+            :param str fields: Comma separated list of fields to be returned.
+            :param str expand: Comma separated list of entities to be expanded.
+            :param int index: The index to start from.
+
+            :returns: Generator of (index, list of issue data) tuples.
+        """
+        # visit all issues in blocks (there's no way to get them all at once)
+        # the page size adapts to the server's cap as well as to latency and payload size of requested fields
+        sizer = self.page_sizes.setdefault((fields, expand), PageSizer(self.issues_per_page))
+        i = index or 0
+        self._local.last_error = None
+        while True:
+            count = sizer.page_size
+            self._local.response_size = None
+            started = time.monotonic()
             result = self.get_issues(search_mask=search_mask,
                                      index=i,
-                                     count=min(issues_per_page, number_of_issues - i),
+                                     count=count,
                                      fields=fields,
                                      expand=expand)
+            sizer.update(count, result, time.monotonic() - started, self._local.response_size)
+
+            if result.get("error"):
+                self.logger.debug("page at %i failed. %s", i, result["error"])
+                self._local.last_error = result["error"]
+                break
+
+            issues = result.get("issues") or []
+            if issues:
+                yield i, issues
+            i += len(issues)
+
+            if not issues or i >= result.get("total", 0):
+                break
+
+    def get_all_issues(self, search_mask="", fields=None, expand=None):
+        """Return the list of all issue data matching the search mask (JQL string).
+
+            :param str search_mask: The JQL string used to search for issues.
+            :param str fields: Comma separated list of fields to be returned.
+
+            :returns: The list of all issue data.
+        """
+        return list(self.iter_issues(search_mask=search_mask, fields=fields, expand=expand))
+
+    def get_issues_columns(self, search_mask="", columns=None, expand=None):
+        """Return selected field paths of all issues matching the search mask (JQL string) as columns.
+
+            Each issue is flattened into the column buffers as soon as its page arrives, the raw json is dropped afterwards.
+
+            Example:
+
+            session.get_issues_columns("project = ABC", {"key": "key", "status": "fields.status.name", "created": "fields.created"})
+
+            :param str search_mask: The JQL string used to search for issues.
+            :param columns: The dictionary with key=column name and value=dotted field path (or list of field paths).
+            :param str expand: Comma separated list of entities to be expanded.
+
+            :returns: The column dictionary with key=column name and value=list of values.
+            :rtype: dict(string, list)
+        """
+        self.logger.debug("get_issues_columns(\"%s\", \"%s\", \"%s\")", search_mask, columns, expand)
 
-            issues = [*issues, *result.get("issues", [])]
-            i += len(result.get("issues", []))
+        columns = _normalize_columns(columns)
+        data = {name: [] for name in columns}
 
-        return issues
+        for issue in self.iter_issues(search_mask=search_mask, fields=_fields_of_columns(columns), expand=expand):
+            for name, path in columns.items():
+                data[name].append(_get_path(issue, path))
+
+        return data
+
+    def get_issues_dataframe(self, search_mask="", columns=None, expand=None):
+        """Return selected field paths of all issues matching the search mask (JQL string) as pandas DataFrame.
+
+            :param str search_mask: The JQL string used to search for issues.
+            :param columns: The dictionary with key=column name and value=dotted field path (or list of field paths).
+            :param str expand: Comma separated list of entities to be expanded.
+
+            :returns: The DataFrame with one row per issue.
+            :rtype: pandas.DataFrame
+        """
+        import pandas as pd
+
+        return pd.DataFrame(self.get_issues_columns(search_mask=search_mask, columns=columns, expand=expand))
+
+    def get_issues_table(self, search_mask="", columns=None, expand=None):
+        """Return selected field paths of all issues matching the search mask (JQL string) as arrow table.
+
+            :param str search_mask: The JQL string used to search for issues.
+            :param columns: The dictionary with key=column name and value=dotted field path (or list of field paths).
+            :param str expand: Comma separated list of entities to be expanded.
+
+            :returns: The arrow table with one row per issue.
+            :rtype: pyarrow.Table
+        """
+        # needs pyarrow
+        import pyarrow as pa
+
+        return pa.table(self.get_issues_columns(search_mask=search_mask, columns=columns, expand=expand))
+
+    def write_issues_parquet(self, path, search_mask="", columns=None, expand=None, rows_per_group=10000, types=None):
+        """Write selected field paths of all issues matching the search mask (JQL string) to a parquet file.
+
+            Rows are written in row groups, so only one row group is kept in memory at once.
+            The schema is fixed up front: columns without a given type are strings (other values than strings
+            are written in json format), so row groups never disagree on column types.
+
+            Example:
+
+            session.write_issues_parquet("issues.parquet", "project = ABC", {"key": "key", "estimate": "fields.timeoriginalestimate"},
+                                         types={"estimate": pyarrow.int64()})
+
+            :param str path: The parquet file path.
+            :param str search_mask: The JQL string used to search for issues.
+            :param columns: The dictionary with key=column name and value=dotted field path (or list of field paths).
+            :param str expand: Comma separated list of entities to be expanded.
+            :param int rows_per_group: The max number of rows per row group.
+            :param types: The optional dictionary with key=column name and value=pyarrow data type.
+
+            :returns: The number of rows written.
+            :rtype: int
+        """
+        self.logger.debug("write_issues_parquet(\"%s\", \"%s\", \"%s\", \"%s\")", path, search_mask, columns, expand)
+
+        # needs pyarrow
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        columns = _normalize_columns(columns)
+        types = types or {}
+        schema = pa.schema([(name, types.get(name, pa.string())) for name in columns])
+        texts = {name for name in columns if name not in types}
+        data = {name: [] for name in columns}
+        rows = 0
+
+        def to_text(value):
+            return value if value is None or isinstance(value, str) else json.dumps(value, separators=(",", ":"))
+
+        def flush():
+            arrays = [pa.array(data[field.name], type=field.type) for field in schema]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            for values in data.values():
+                values.clear()
+
+        with pq.ParquetWriter(path, schema) as writer:
+            for issue in self.iter_issues(search_mask=search_mask, fields=_fields_of_columns(columns), expand=expand):
+                for name, field_path in columns.items():
+                    value = _get_path(issue, field_path)
+                    data[name].append(to_text(value) if name in texts else value)
+                rows += 1
+                if rows % rows_per_group == 0:
+                    flush()
+            if rows % rows_per_group:
+                flush()
+
+        return rows
+
+    def export_issues(self, search_mask="", fields=None, path="issues.ndjson", expand=None, compression=None, buffer_size=1024 * 1024, resume=True):
+        """Export all issue data matching the search mask (JQL string) to a newline-delimited json file.
+
+            Pages are written as they arrive, at most buffer_size bytes are buffered before writing.
+            After each page a checkpoint (<path>.checkpoint) is written, so an interrupted export resumes at the last page.
+            Compressed output consists of concatenated gzip members resp. zstd frames, which common tools read as one stream.
+            Resuming relies on a stable order of results, so the search mask should contain an ORDER BY clause (e.g. "ORDER BY key").
+            If a request fails, the checkpoint is kept and an IOError is raised, so the export can be resumed by calling it again.
+
+            :param str search_mask: The JQL string used to search for issues.
+            :param str fields: Comma separated list of fields to be returned.
+            :param str path: The output file path.
+            :param str expand: Comma separated list of entities to be expanded.
+            :param str compression: None, "gzip" or "zstd" (default is derived from path suffix .gz resp. .zst).
+            :param int buffer_size: The max number of uncompressed bytes buffered before writing.
+            :param bool resume: Resume an interrupted export of the same search (if there's a checkpoint).
+
+            :returns: The number of issues exported.
+            :rtype: int
+        """
+        self.logger.debug("export_issues(\"%s\", \"%s\", \"%s\", \"%s\", \"%s\")", search_mask, fields, path, expand, compression)
+
+        if compression is None:
+            compression = "gzip" if path.endswith(".gz") else "zstd" if path.endswith(".zst") else ""
+
+        if compression == "gzip":
+            compress = gzip.compress
+        elif compression == "zstd":
+            # needs zstandard
+            import zstandard
+            compress = zstandard.ZstdCompressor().compress
+        elif not compression:
+            compress = bytes
+        else:
+            raise ValueError("compression {0} not supported".format(compression))
+
+        checkpoint_path = path + ".checkpoint"
+        query = {"search_mask": search_mask, "fields": fields, "expand": expand, "compression": compression}
+        checkpoint = {**query, "startAt": 0, "offset": 0, "count": 0}
+
+        if resume and os.path.exists(checkpoint_path) and os.path.exists(path):
+            with open(checkpoint_path, "r") as f:
+                previous = json.load(f)
+            if all(previous.get(k) == v for k, v in query.items()):
+                checkpoint = previous
+                self.logger.debug("resuming export at %i", checkpoint["startAt"])
+
+        with open(path, "r+b" if checkpoint["offset"] else "wb") as f:
+            # drop anything written after the last checkpoint
+            f.truncate(checkpoint["offset"])
+            f.seek(checkpoint["offset"])
+
+            buffer = bytearray()
+            for index, issues in self.iter_issue_pages(search_mask=search_mask, fields=fields, expand=expand, index=checkpoint["startAt"]):
+                for issue in issues:
+                    buffer += json.dumps(issue, separators=(",", ":")).encode("utf-8")
+                    buffer += b"\n"
+                    if len(buffer) >= buffer_size:
+                        f.write(compress(bytes(buffer)))
+                        buffer.clear()
+                if buffer:
+                    f.write(compress(bytes(buffer)))
+                    buffer.clear()
+                f.flush()
+                os.fsync(f.fileno())
+
+                checkpoint.update({"startAt": index + len(issues), "offset": f.tell(), "count": checkpoint["count"] + len(issues)})
+                with open(checkpoint_path + ".tmp", "w") as cf:
+                    json.dump(checkpoint, cf)
+                os.replace(checkpoint_path + ".tmp", checkpoint_path)
+
+        if self.last_error is not None:
+            raise IOError("export interrupted after {0} issues. {1}".format(checkpoint["count"], self.last_error))
+
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+
+        return checkpoint["count"]
 
     def get_number_of_issues(self, search_mask=""):
         """Return the number of issues matching the search mask (JQL string).
@@ -247,8 +734,8 @@ class Jira(object):
         """Return the creation of issues matching the search mask (JQL string).
 
             :param str search_mask: The JQL string used to search for issues.
-            :param date start_date: The start date to search for logged work.
-            :param date end_date: The end date to search for logged work.
+            :param date start_date: The start date to search for created issues.
+            :param date end_date: The end date to search for created issues.
 
             :returns: The creation dictionary with key=creator and value=number_of_issues_created.
             :rtype: dict(string, int)
@@ -257,66 +744,38 @@ class Jira(object):
 
         issues_creation = {}
 
-        # get total number issues
-        number_of_issues = self.get_issues(search_mask=search_mask, index=None, count=None)["total"]
-
-        self.logger.debug("searching inside of %i issues", number_of_issues)
+        # let the server skip issues created outside of the time window
+        search_mask = plan_search(search_mask, start_date, end_date, date_field="created")
 
-        # visit all issues in blocks of 1000 (there's no way to get them all at once)
-        issues_per_page = 1000
-        i = 0
-        while i < number_of_issues:
-            list_of_issues = self.get_issues(search_mask=search_mask,
-                                             index=i,
-                                             count=min(issues_per_page, number_of_issues - i),
-                                             fields="key, created, reporter")
-
-            for issue in list_of_issues["issues"]:
-                if "reporter" not in issue["fields"] or not issue["fields"]["reporter"]:
-                    pass
-                elif issue["fields"]["reporter"].get("emailAddress") is not None:
-                    created = datetime.strptime(issue["fields"]["created"].split("T")[0], "%Y-%m-%d")  # T%H:%M:%S.%f")
-                    if (created >= start_date) and (created <= end_date):
-                        issues_creation.setdefault((issue["fields"]["reporter"]["emailAddress"]).split("@")[0].lower(), []).append(1)
-                i += 1
+        for issue in self.iter_issues(search_mask=search_mask, fields="created,reporter"):
+            if "reporter" not in issue["fields"] or not issue["fields"]["reporter"]:
+                pass
+            elif issue["fields"]["reporter"].get("emailAddress") is not None:
+                created = datetime.strptime(issue["fields"]["created"].split("T")[0], "%Y-%m-%d")  # T%H:%M:%S.%f")
+                if (created >= start_date) and (created <= end_date):
+                    issues_creation.setdefault((issue["fields"]["reporter"]["emailAddress"]).split("@")[0].lower(), []).append(1)
         return {k: sum(v) for k, v in issues_creation.items()}
 
-    def get_issues_worklog(self, search_mask="", start_date=datetime.min, end_date=datetime.max):
+    def get_issues_worklog(self, search_mask="", start_date=datetime.min, end_date=datetime.max, users=None, pushdown=False):
         """Return the worklog of issues matching the search mask (JQL string).
 
             :param str search_mask: The JQL string used to search for issues.
             :param date start_date: The start date to search for logged work.
             :param date end_date: The end date to search for logged work.
+            :param users: The optional list of users (lowercase, e.g. "prename.surname") to search for logged work.
+            :param bool pushdown: Restrict the search to issues with worklogs (of users) within the time window.
+                                  Note that worklogDate refers to the start of a worklog while the time window
+                                  is checked against its last update, so work logged in advance may be missed.
 
             :returns: The worklog dictionary with key=author and value=hours.
             :rtype: dict(string, float)
         """
-        self.logger.debug("get_issues_worklog(\"%s\", \"%s\", \"%s\")", search_mask, start_date, end_date)
+        self.logger.debug("get_issues_worklog(\"%s\", \"%s\", \"%s\", \"%s\", \"%s\")", search_mask, start_date, end_date, users, pushdown)
 
-        issues_worklog = {}
+        if pushdown:
+            search_mask = plan_search(search_mask, start_date, end_date, date_field="worklogDate", authors=users, author_field="worklogAuthor")
 
-        # get total number issues
-        number_of_issues = self.get_issues(search_mask=search_mask, index=None, count=None)["total"]
-
-        self.logger.debug("searching inside of %i issues", number_of_issues)
-
-        # visit all issues in blocks of 1000 (there's no way to get them all at once)
-        issues_per_page = 1000
-        i = 0
-        while i < number_of_issues:
-            list_of_issues = self.get_issues(search_mask=search_mask,
-                                             index=i,
-                                             count=min(issues_per_page, number_of_issues - i),
-                                             fields="key, worklog")
-
-            for issue in list_of_issues["issues"]:
-                for worklog in issue["fields"]["worklog"]["worklogs"]:
-                    if worklog["author"].get("emailAddress") is not None:
-                        updated = datetime.strptime(worklog["updated"].split("T")[0], "%Y-%m-%d")  # T%H:%M:%S.%f")
-                        if (updated >= start_date) and (updated <= end_date):
-                            issues_worklog.setdefault((worklog["author"]["emailAddress"]).split("@")[0].lower(), []).append(worklog["timeSpentSeconds"])
-                i += 1
-        return {k: sum(v) / 3600 for k, v in issues_worklog.items()}
+        return _sum_worklogs(self.iter_issues(search_mask=search_mask, fields="worklog"), start_date, end_date, users)
 
     def get_period_issuecreation(self, search_mask="", time_slot_in_weeks=1, num_time_slots=12, include_current_time_slot=False, users=None):
         """Return the creation of issues matching the search mask (JQL string) within given time slots.
@@ -348,7 +807,8 @@ class Jira(object):
             if not include_current_time_slot:
                 finish_date = dte.end_of_day(finish_date - timedelta(seconds=1))
 
-        issues = self.get_all_issues(search_mask=search_mask, fields="key, created, reporter")
+        # let the server skip issues created outside of all periods
+        issues = self.get_all_issues(search_mask=plan_search(search_mask, start_date, finish_date + timedelta(days=max(time_slot_in_weeks * 7, 1)), date_field="created"), fields="created,reporter")
 
         while start_date <= finish_date:
 
@@ -392,17 +852,19 @@ class Jira(object):
 
         return period_worklog
 
-    def get_period_worklog(self, search_mask="", time_slot_in_weeks=1, num_time_slots=12, include_current_time_slot=False, users=None):
+    def get_period_worklog(self, search_mask="", time_slot_in_weeks=1, num_time_slots=12, include_current_time_slot=False, users=None, pushdown=False):
         """Return the worklog of issues matching the search mask (JQL string) within given time slots.
 
             :param str search_mask: The JQL string used to search for issues.
             :param int time_slot_in_weeks: The start date to search for logged work.
             :param int num_time_slots: The end date to search for logged work.
+            :param users: The optional list of users (lowercase, e.g. "prename.surname") to search for logged work.
+            :param bool pushdown: Restrict the search to issues with worklogs (of users) within the time slots (see get_issues_worklog).
 
             :returns: The worklog dictionary with key=author and value=hours.
             :rtype: dict(string, float)
         """
-        self.logger.debug("get_period_worklog(\"%s\", \"%s\", \"%s\", \"%s\", \"%s\")", search_mask, time_slot_in_weeks, num_time_slots, include_current_time_slot, users)
+        self.logger.debug("get_period_worklog(\"%s\", \"%s\", \"%s\", \"%s\", \"%s\", \"%s\")", search_mask, time_slot_in_weeks, num_time_slots, include_current_time_slot, users, pushdown)
 
         logged_users = []
         period_worklog = {}
@@ -422,7 +884,11 @@ class Jira(object):
             if not include_current_time_slot:
                 finish_date = dte.end_of_day(finish_date - timedelta(seconds=1))
 
-        issues = self.get_all_issues(search_mask=search_mask, fields="key, worklog")
+        if pushdown:
+            # let the server skip issues without worklogs (of users) within all periods
+            search_mask = plan_search(search_mask, start_date, finish_date + timedelta(days=max(time_slot_in_weeks * 7, 1)), date_field="worklogDate", authors=users, author_field="worklogAuthor")
+
+        issues = self.get_all_issues(search_mask=search_mask, fields="worklog")
 
         while start_date <= finish_date:
 
@@ -477,51 +943,19 @@ class Jira(object):
         self.logger.debug("get_sprint_worklog(\"%s\", \"%s\")", board, users)
 
         # find the board id
-        board_id = -1
-        boards = self.get_boards()
-
-        for bd in boards:
-            if bd["name"] == board:
-                board_id = bd["id"]
-                break
+        board_id = _get_board_id(self.get_boards(), board)
 
         if board_id == -1:
             self.logger.debug("board name unknown or not found.")
             return {}
 
-        logged_users = []
-        worklog = {}
-
         # Get the sprints in specific board
-        sprints = self.get_sprints(board_id)
+        sprints = [sprint for sprint in self.get_sprints(board_id) if sprint["state"] != "future"]
 
         # Get the worklogs of each sprint
-        for sprint in sprints:
-            if sprint["state"] == "future":
-                continue
+        worklogs = [self.get_issues_worklog(**_sprint_worklog_search(sprint)) for sprint in sprints]
 
-            issues_worklog = self.get_issues_worklog(search_mask="sprint=%d" % sprint["id"],
-                                                     start_date=datetime.strptime(sprint["startDate"].split("T")[0], "%Y-%m-%d"),  # T%H:%M:%S.%f"),
-                                                     end_date=datetime.strptime(sprint["endDate"].split("T")[0], "%Y-%m-%d"))  # T%H:%M:%S.%f"))
-
-            logged_users.extend([user for user in issues_worklog if user not in logged_users])
-
-            # making sprint name unique
-            sprint_name = "{} {} ({}, {})".format(board, sprint["name"], sprint["startDate"].split("T")[0], sprint["endDate"].split("T")[0])
-
-            # build sprint statistic
-            worklog[sprint_name] = {}
-            for user in (users or issues_worklog):
-                worklog[sprint_name][user] = issues_worklog[user] if user in issues_worklog else 0.0
-
-        # fill gaps
-        if not users:
-            for sprint_name in worklog:
-                for user in logged_users:
-                    if user not in worklog[sprint_name]:
-                        worklog[sprint_name][user] = 0.0
-
-        return worklog
+        return _build_sprint_worklog(board, sprints, worklogs, users)
 
     def get_sprint_report(self, board_id, sprint_id):
         """Return the sprint report of given board and sprint.
@@ -581,35 +1015,88 @@ class Jira(object):
         self.logger.debug("get_sprint_reports(\"%s\")", board)
 
         # find the board id
-        board_id = -1
-        boards = self.get_boards()
-
-        for bd in boards:
-            if bd["name"] == board:
-                board_id = bd["id"]
-                break
+        board_id = _get_board_id(self.get_boards(), board)
 
         if board_id == -1:
             self.logger.debug("board name unknown or not found.")
             return {}
 
-        report = {}
-
         # Get the sprints in specific board
-        sprints = self.get_sprints(board_id)
+        sprints = [sprint for sprint in self.get_sprints(board_id) if sprint["state"] != "future"]
 
-        # Get the worklogs of each sprint
-        for sprint in sprints:
-            if sprint["state"] == "future":
-                continue
+        # Get the report of each sprint
+        return {_sprint_name(board, sprint): {"issues": self.get_sprint_report(board_id, sprint["id"])} for sprint in sprints}
+
+    def _get_boards_sprints(self, boards, executor):
+        """Return the dictionary with key=board name and value=(board id, list of started sprints) of given boards.
+
+            Board ids are resolved from one board listing, the sprints of all boards are requested concurrently.
+        """
+        board_list = self.get_boards()
+        board_ids = {board: _get_board_id(board_list, board) for board in boards}
+
+        for board, board_id in board_ids.items():
+            if board_id == -1:
+                self.logger.debug("board name %s unknown or not found.", board)
+
+        # each board id is requested once only, even if given multiple times
+        unique_ids = sorted({board_id for board_id in board_ids.values() if board_id != -1})
+        sprints = dict(zip(unique_ids, executor.map(self.get_sprints, unique_ids)))
+
+        return {board: (board_id, [sprint for sprint in sprints[board_id] if sprint["state"] != "future"])
+                for board, board_id in board_ids.items() if board_id != -1}
+
+    def get_boards_sprint_worklog(self, boards, users=None, max_workers=8):
+        """Return the worklog of all completed sprints within multiple boards.
+
+            The worklogs of all sprints of all boards are requested concurrently, so the runtime is bounded by the slowest board.
+
+            :param boards: The list of board names to search for logged work.
+            :param users: The list of users (lowercase, e.g. "prename.surname") to search for logged work.
+            :param int max_workers: The max number of concurrent requests.
+
+            :returns: The nested worklog dictionary with key1=board key2=sprint key3=author and value=hours (see get_sprint_worklog).
+            :rtype: dict(dict(dict(string, float)))
+        """
+        self.logger.debug("get_boards_sprint_worklog(\"%s\", \"%s\", \"%s\")", boards, users, max_workers)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            boards_sprints = self._get_boards_sprints(boards, executor)
+
+            # sprints shared by boards are searched once only
+            futures = {}
+            for board_id, sprints in boards_sprints.values():
+                for sprint in sprints:
+                    if sprint["id"] not in futures:
+                        futures[sprint["id"]] = executor.submit(lambda sprint: self.get_issues_worklog(**_sprint_worklog_search(sprint)), sprint)
+
+            return {board: _build_sprint_worklog(board, sprints, [futures[sprint["id"]].result() for sprint in sprints], users)
+                    for board, (board_id, sprints) in boards_sprints.items()}
+
+    def get_boards_sprint_reports(self, boards, max_workers=8):
+        """Return the reports of all sprints within multiple boards.
 
-            # making sprint name unique
-            sprint_name = "{} {} ({}, {})".format(board, sprint["name"], sprint["startDate"].split("T")[0], sprint["endDate"].split("T")[0])
+            The reports of all sprints of all boards are requested concurrently, so the runtime is bounded by the slowest board.
 
-            # build sprint statistic
-            report[sprint_name] = {"issues": self.get_sprint_report(board_id, sprint["id"])}
+            :param boards: The list of board names to search for.
+            :param int max_workers: The max number of concurrent requests.
 
-        return report
+            :returns: The statistic dictionary with key1=board key2=sprint and value=issues (see get_sprint_reports).
+            :rtype: dict(board, dict(sprint, issues))
+        """
+        self.logger.debug("get_boards_sprint_reports(\"%s\", \"%s\")", boards, max_workers)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            boards_sprints = self._get_boards_sprints(boards, executor)
+
+            futures = {}
+            for board_id, sprints in boards_sprints.values():
+                for sprint in sprints:
+                    if (board_id, sprint["id"]) not in futures:
+                        futures[(board_id, sprint["id"])] = executor.submit(self.get_sprint_report, board_id, sprint["id"])
+
+            return {board: {_sprint_name(board, sprint): {"issues": futures[(board_id, sprint["id"])].result()} for sprint in sprints}
+                    for board, (board_id, sprints) in boards_sprints.items()}
 
     def get_issues_remaining_estimate(self, search_mask="", **kwargs):
         """Return the remaining time estimate of issues matching the search mask (JQL string).
@@ -629,11 +1116,7 @@ class Jira(object):
 
         assert not kwargs, "Unknown arguments: %r" % kwargs
 
-        # get total number issues
-        number_of_issues = self.get_issues(search_mask=search_mask, index=None, count=None)["total"]
-
-        self.logger.debug("searching inside of %i issues", number_of_issues)
-
+        number_of_issues = 0
         issues_unestimated = []
         sum_of_remaining_time = 0
 
@@ -645,23 +1128,14 @@ class Jira(object):
         else:
             time_unit = "hours"  # default
 
-        # visit all issues in blocks of 1000 (there's no way to get them all at once)
-        issues_per_page = 1000
-        i = 0
-        while i < number_of_issues:
-            list_of_issues = self.get_issues(search_mask=search_mask,
-                                             index=i,
-                                             count=min(issues_per_page, number_of_issues - i),
-                                             fields="key, summary, timeoriginalestimate, timetracking")
-
-            for issue in list_of_issues["issues"]:
-                original_time = int(issue["fields"].get("timeoriginalestimate") or 0)
-                remaining_time = int(issue["fields"]["timetracking"].get("remainingEstimateSeconds") or 0)
-                if (remaining_time <= 0) or (original_time <= 0):
-                    issues_unestimated.append(issue["key"])
-                sum_of_remaining_time += remaining_time
-                self.logger.debug("%s;%s;%.2f;%.2f", issue["key"], issue["fields"]["summary"], original_time * time_unit_factor, remaining_time * time_unit_factor)
-                i += 1
+        for issue in self.iter_issues(search_mask=search_mask, fields="summary,timeoriginalestimate,timetracking"):
+            original_time = int(issue["fields"].get("timeoriginalestimate") or 0)
+            remaining_time = int(issue["fields"]["timetracking"].get("remainingEstimateSeconds") or 0)
+            if (remaining_time <= 0) or (original_time <= 0):
+                issues_unestimated.append(issue["key"])
+            sum_of_remaining_time += remaining_time
+            self.logger.debug("%s;%s;%.2f;%.2f", issue["key"], issue["fields"]["summary"], original_time * time_unit_factor, remaining_time * time_unit_factor)
+            number_of_issues += 1
 
         sum_of_remaining_time = sum_of_remaining_time * time_unit_factor
         if estimate_unestimated:  # estimate the unestimated
@@ -670,6 +1144,127 @@ class Jira(object):
         self.logger.debug("remarks: there are %i issues unestimated", len(issues_unestimated))
         return sum_of_remaining_time
 
+    def get_changelog(self, key):
+        """Return the complete changelog of an issue.
+
+            :param key: The issue key.
+
+            :returns: The list of changelog histories.
+        """
+        self.logger.debug("get_changelog(\"%s\")", key)
+
+        histories = []
+        i = 0
+        while True:
+            path = self.api + "/issue/{0}/changelog?startAt={1}"
+            response = self._get_data(path.format(urllib.parse.quote_plus(key or ""), i))
+            if response.get("error"):
+                break
+            values = response.get("values") or []
+            histories.extend(values)
+            i += len(values)
+            if not values or response.get("isLast", True):
+                return histories
+
+        # older servers don't provide the changelog resource, but return the complete changelog on expansion
+        path = self.api + "/issue/{0}?fields=status&expand=changelog"
+        response = self._get_data(path.format(urllib.parse.quote_plus(key or "")))
+        return [] if response.get("error") else response.get("changelog", {}).get("histories") or []
+
+    def iter_status_durations(self, search_mask="", until=None, max_workers=8):
+        """Iterate over the status durations of issues matching the search mask (JQL string).
+
+            Changelogs are processed page by page as they arrive. Changelogs truncated in the search response are fetched concurrently.
+
+            :param str search_mask: The JQL string used to search for issues.
+            :param datetime until: The (timezone aware) end of the current status (default is now).
+            :param int max_workers: The max number of concurrent changelog requests.
+
+            :returns: Generator of (issue key, list of (status, entered, left)) tuples.
+        """
+        self.logger.debug("iter_status_durations(\"%s\", \"%s\", \"%s\")", search_mask, until, max_workers)
+
+        until = until or datetime.now(timezone.utc)
+        page_size = self.page_sizes.get(("status,created", "changelog"), PageSizer(self.issues_per_page)).page_size
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            page = []
+            for issue in self.iter_issues(search_mask=search_mask, fields="status,created", expand="changelog"):
+                changelog = issue.get("changelog") or {}
+                histories = changelog.get("histories") or []
+                if changelog.get("total", 0) > len(histories):
+                    histories = executor.submit(self.get_changelog, issue["key"])
+                page.append((issue, histories))
+
+                if len(page) >= page_size:
+                    yield from ((issue["key"], _status_periods(issue, histories, until)) for issue, histories in page)
+                    page = []
+            yield from ((issue["key"], _status_periods(issue, histories, until)) for issue, histories in page)
+
+    def get_status_statistics(self, search_mask="", time_slot_in_weeks=1, done_statuses=("Resolved", "Closed", "Done"), bins=None, per_issue=False, **kwargs):
+        """Return status duration statistics of issues matching the search mask (JQL string).
+
+            Statistics are computed incrementally, so memory is bounded by the number of statuses, bins and periods
+            (unless per issue durations are requested).
+
+            :param str search_mask: The JQL string used to search for issues.
+            :param int time_slot_in_weeks: The period length for throughput (0 means daily periods).
+            :param done_statuses: The statuses counting as done for throughput and cycle time.
+            :param bins: The histogram bin edges in hours (default is 1h, 4h, 8h, 1d, 3d, 1w, 2w, 30d).
+            :param bool per_issue: Also return the status durations per issue.
+            :param **kwargs: Arbitrary list of keyword arguments (see iter_status_durations)
+
+            :returns: The statistic dictionary with
+                      "durations" (key=status, value=total hours), "histogram" (key1=status, key2=bin, value=number of periods),
+                      "throughput" (key=period, value=number of issues done), "cycle_time" (key=bin, value=number of issues done,
+                      measured from first leaving the initial status) and if requested
+                      "issues" (key=issue key, value=dict(status, hours)) and "cycle_times" (key=issue key, value=hours).
+            :rtype: dict
+        """
+        self.logger.debug("get_status_statistics(\"%s\", \"%s\", \"%s\", \"%s\", \"%s\")", search_mask, time_slot_in_weeks, done_statuses, bins, per_issue)
+
+        bins = sorted(bins or [1, 4, 8, 24, 72, 168, 336, 720])
+        labels = ["<{0}h".format(bins[0])] + ["{0}h-{1}h".format(a, b) for a, b in zip(bins, bins[1:])] + [">={0}h".format(bins[-1])]
+
+        statistics = {"durations": {}, "histogram": {}, "throughput": {}, "cycle_time": {label: 0 for label in labels}}
+        if per_issue:
+            statistics["issues"] = {}
+            statistics["cycle_times"] = {}
+
+        for key, periods in self.iter_status_durations(search_mask=search_mask, **kwargs):
+            issue_durations = {}
+            for status, entered, left in periods:
+                hours = (left - entered).total_seconds() / 3600
+                issue_durations[status] = issue_durations.get(status, 0.0) + hours
+                statistics["durations"][status] = statistics["durations"].get(status, 0.0) + hours
+                histogram = statistics["histogram"].setdefault(status, {label: 0 for label in labels})
+                histogram[labels[bisect.bisect_right(bins, hours)]] += 1
+
+            if per_issue:
+                statistics["issues"][key] = issue_durations
+
+            # the issue is done if its current status is a done status
+            if periods and periods[-1][0] in done_statuses:
+                done = periods[-1][1]
+                if time_slot_in_weeks > 0:
+                    start_date = dte.start_of_week(done)
+                    start_date -= timedelta(days=7 * ((start_date.date() - datetime(1970, 1, 5).date()).days // 7 % time_slot_in_weeks))
+                    end_date = dte.end_of_week(start_date + timedelta(days=time_slot_in_weeks * 7 - 7))
+                else:
+                    start_date = dte.start_of_day(done)
+                    end_date = dte.end_of_day(done)
+                period_name = "{} ({}, {})".format("period", start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"))
+                statistics["throughput"][period_name] = statistics["throughput"].get(period_name, 0) + 1
+
+                if len(periods) > 1:
+                    hours = (done - periods[0][2]).total_seconds() / 3600
+                    statistics["cycle_time"][labels[bisect.bisect_right(bins, hours)]] += 1
+                    if per_issue:
+                        statistics["cycle_times"][key] = hours
+
+        statistics["throughput"] = dict(sorted(statistics["throughput"].items()))
+        return statistics
+
     def get_issues_commented_by_author(self, author, search_mask=""):
         """Return a list of issues commented by author and matching the search mask (JQL string).
 
@@ -681,27 +1276,40 @@ class Jira(object):
         """
         self.logger.debug("get_issues_commented_by_author(\"%s\", \"%s\")", author, search_mask)
 
-        # get total number of issues
-        number_of_issues = self.get_issues(search_mask=search_mask, index=None, count=None)["total"]
+        list_of_comments = []
 
-        self.logger.debug("searching inside of %i issues", number_of_issues)
+        for issue in self.iter_issues(search_mask=search_mask, fields="comment"):
+            comments = issue["fields"]["comment"]["comments"]
+            if issue["fields"]["comment"].get("total", 0) > len(comments):
+                # the search response contains the first page of comments only
+                comments = self.get_comments(issue["key"])
+            comments = [(comment["created"], comment["body"]) for comment in comments if comment["author"]["key"] == author]
+            if comments != []:
+                list_of_comments.append((issue["key"], comments))
+        return list_of_comments
 
-        list_of_comments = []
+    def get_comments(self, key):
+        """Return all comments of an issue.
+
+            :param key: The issue key.
+
+            :returns: The list of comment data.
+        """
+        self.logger.debug("get_comments(\"%s\")", key)
 
-        # visit all issues in blocks of 1000 (there's no way to get them all at once)
-        issues_per_page = 1000
+        comments = []
         i = 0
-        while i < number_of_issues:
-            list_of_issues = self.get_issues(search_mask=search_mask,
-                                             index=i,
-                                             count=min(issues_per_page, number_of_issues - i),
-                                             fields="key, comment")
-            for issue in list_of_issues["issues"]:
-                comments = [(comment["created"], comment["body"]) for comment in issue["fields"]["comment"]["comments"] if comment["author"]["key"] == author]
-                if comments != []:
-                    list_of_comments.append((issue["key"], comments))
-                i += 1
-        return list_of_comments
+        while True:
+            path = self.api + "/issue/{0}/comment?startAt={1}"
+            response = self._get_data(path.format(urllib.parse.quote_plus(key or ""), i))
+            if response.get("error"):
+                break
+            values = response.get("comments") or []
+            comments.extend(values)
+            i += len(values)
+            if not values or i >= response.get("total", 0):
+                break
+        return comments
 
     def get_transitions(self, key):
         """Returns possible transitions.
@@ -831,25 +1439,28 @@ class Jira(object):
                               key, issue["fields"]["status"]["name"], set([name for id, name in transitions]))
             return False
 
-    def close_issue(self, key, assignee=None, comment=None):
+    def close_issue(self, key, assignee=None, comment=None, subtasks=True, issue=None):
         """Close issue (and subtasks). If existing, remainingEstimate is set to 0.
 
             :param key: The issue key.
             :param assignee: The optional new assignee.
             :param comment: The optional comment.
+            :param bool subtasks: Close subtasks as well.
+            :param issue: The optional issue data (if fetched already, it isn't requested again).
 
             :returns: True if transition succeeded, False if not
             :rtype: bool
         """
         self.logger.debug("close_issue(\"%s\", \"%s\", \"%s\")", key, assignee, comment)
 
-        issue = self.get_issue(key)
+        if issue is None:
+            issue = self.get_issue(key)
 
         if not issue:
             self.logger.debug("issue %s not accessible or not found", key)
             return False
 
-        for subtask in issue["fields"]["subtasks"]:
+        for subtask in (issue["fields"]["subtasks"] if subtasks else []):
             self.close_issue(subtask["key"])
 
         transitions = self.get_transitions(key)
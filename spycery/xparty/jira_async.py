@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""This module provides asyncio functionality for JIRA interaction."""
+
+# standard
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import functools
+import logging
+import urllib.parse
+import weakref
+
+# local
+from spycery.xparty.jira import Jira, _build_sprint_worklog, _get_board_id, _sprint_name, _sprint_worklog_search, _sum_worklogs, plan_search
+
+
+class AsyncJira(object):
+    """The AsyncJira class.
+
+       Provides coroutine versions of the search, agile, worklog, transition and attachment methods of the Jira class.
+       Blocking requests run on a pool of worker threads (each with its own session and connection), independent requests
+       are gathered concurrently. The number of connections and the number of concurrent requests are limited.
+
+       Example:
+
+       async with AsyncJira(<url with scheme>, <username>, <password>, connections=10) as session:
+           reports = await asyncio.gather(*[session.get_sprint_reports(board) for board in boards])
+    """
+
+    def __init__(self, server, username, password, connections=10, concurrency=None):
+        """Construct a new instance.
+
+            :param server: The JIRA server URL to be accessed. Should include the scheme as well.
+            :param user: The user name.
+            :param password: The password.
+            :param int connections: The max number of connections (and worker threads).
+            :param int concurrency: The max number of concurrent requests (default is number of connections).
+        """
+        self.jira = Jira(server, username, password)
+        self.concurrency = concurrency or connections
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._executor = ThreadPoolExecutor(max_workers=connections)
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def close(self):
+        """Release worker threads and connections."""
+        self._executor.shutdown(wait=False)
+        self.jira.close()
+
+    async def _call(self, method, *args, **kwargs):
+        """Run a blocking method of the Jira instance on a worker thread (limited by concurrency)."""
+        loop = asyncio.get_running_loop()
+        # semaphores are bound to their event loop (and may reference it), drop the ones of closed loops
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            for closed in [other for other in list(self._semaphores.keys()) if other.is_closed()]:
+                self._semaphores.pop(closed, None)
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.concurrency)
+        async with semaphore:
+            return await loop.run_in_executor(self._executor, functools.partial(method, *args, **kwargs))
+
+    async def get_boards(self):
+        """Return the list of all boards."""
+        return await self._call(self.jira.get_boards)
+
+    async def get_board_id(self, board):
+        """Return the id of the board with given name or -1 if not found."""
+        return _get_board_id(await self.get_boards(), board)
+
+    async def get_projects(self, board_id):
+        """Return the list of projects of given board."""
+        return await self._call(self.jira.get_projects, board_id)
+
+    async def get_sprints(self, board_id):
+        """Return the list of sprints of given board."""
+        return await self._call(self.jira.get_sprints, board_id)
+
+    async def get_issues(self, search_mask="", index=0, count=1000, fields=None, expand=None):
+        """Return the list of issue data matching the search mask (JQL string) (see Jira.get_issues)."""
+        return await self._call(self.jira.get_issues, search_mask=search_mask, index=index, count=count, fields=fields, expand=expand)
+
+    async def get_number_of_issues(self, search_mask=""):
+        """Return the number of issues matching the search mask (JQL string)."""
+        return await self._call(self.jira.get_number_of_issues, search_mask=search_mask)
+
+    async def get_all_issues(self, search_mask="", fields=None, expand=None):
+        """Return the list of all issue data matching the search mask (JQL string).
+
+            The first page reveals the number of issues and the server's page size cap, the remaining pages are requested concurrently.
+            A failed page raises an IOError instead of returning an incomplete list.
+
+            :param str search_mask: The JQL string used to search for issues.
+            :param str fields: Comma separated list of fields to be returned.
+            :param str expand: Comma separated list of entities to be expanded.
+
+            :returns: The list of all issue data.
+        """
+        self.logger.debug("get_all_issues(\"%s\", \"%s\", \"%s\")", search_mask, fields, expand)
+
+        first = await self.get_issues(search_mask=search_mask, index=0, count=self.jira.issues_per_page, fields=fields, expand=expand)
+        self._check_page(first, 0)
+        issues = list(first.get("issues") or [])
+        total = first.get("total", 0)
+        page_size = len(issues)
+        if not page_size or page_size >= total:
+            return issues
+
+        pages = await asyncio.gather(*[self.get_issues(search_mask=search_mask, index=i, count=page_size, fields=fields, expand=expand)
+                                       for i in range(page_size, total, page_size)])
+        for i, page in zip(range(page_size, total, page_size), pages):
+            self._check_page(page, i)
+            issues.extend(page.get("issues") or [])
+        return issues
+
+    def _check_page(self, page, index):
+        """Raise an IOError if the request of the page at given index failed."""
+        if page.get("error"):
+            self.logger.debug("page at %i failed. %s", index, page["error"])
+            raise IOError("page at {0} failed. {1}".format(index, page["error"]))
+
+    async def get_issues_worklog(self, search_mask="", start_date=datetime.min, end_date=datetime.max, users=None, pushdown=False):
+        """Return the worklog of issues matching the search mask (JQL string) (see Jira.get_issues_worklog).
+
+            :returns: The worklog dictionary with key=author and value=hours.
+            :rtype: dict(string, float)
+        """
+        if pushdown:
+            search_mask = plan_search(search_mask, start_date, end_date, date_field="worklogDate", authors=users, author_field="worklogAuthor")
+
+        issues = await self.get_all_issues(search_mask=search_mask, fields="worklog")
+        return _sum_worklogs(issues, start_date, end_date, users)
+
+    async def get_sprint_worklog(self, board, users=None):
+        """Return the worklog of all completed sprints within a board (see Jira.get_sprint_worklog).
+
+            The worklogs of all sprints are requested concurrently.
+
+            :returns: The nested worklog dictionary with key1=sprint key2=author and value=hours.
+            :rtype: dict(dict(string, float))
+        """
+        self.logger.debug("get_sprint_worklog(\"%s\", \"%s\")", board, users)
+
+        board_id = await self.get_board_id(board)
+        if board_id == -1:
+            self.logger.debug("board name unknown or not found.")
+            return {}
+
+        sprints = [sprint for sprint in await self.get_sprints(board_id) if sprint["state"] != "future"]
+        worklogs = await asyncio.gather(*[self.get_issues_worklog(**_sprint_worklog_search(sprint)) for sprint in sprints])
+
+        return _build_sprint_worklog(board, sprints, worklogs, users)
+
+    async def get_sprint_report(self, board_id, sprint_id):
+        """Return the sprint report of given board and sprint (see Jira.get_sprint_report)."""
+        return await self._call(self.jira.get_sprint_report, board_id, sprint_id)
+
+    async def get_sprint_reports(self, board):
+        """Return the reports of all sprints within a board (see Jira.get_sprint_reports).
+
+            The reports of all sprints are requested concurrently.
+
+            :returns: The statistic dictionary with key=sprint and value=issues.
+            :rtype: dict(sprint, issues)
+        """
+        self.logger.debug("get_sprint_reports(\"%s\")", board)
+
+        board_id = await self.get_board_id(board)
+        if board_id == -1:
+            self.logger.debug("board name unknown or not found.")
+            return {}
+
+        sprints = [sprint for sprint in await self.get_sprints(board_id) if sprint["state"] != "future"]
+        reports = await asyncio.gather(*[self.get_sprint_report(board_id, sprint["id"]) for sprint in sprints])
+
+        return {_sprint_name(board, sprint): {"issues": issues} for sprint, issues in zip(sprints, reports)}
+
+    async def get_issue(self, key):
+        """Get information about issue."""
+        return await self._call(self.jira.get_issue, key)
+
+    async def get_transitions(self, key):
+        """Return the list (id, name) of possible transitions."""
+        return await self._call(self.jira.get_transitions, key)
+
+    async def get_transition_names(self, key):
+        """Return the list of names of possible transitions."""
+        return await self._call(self.jira.get_transition_names, key)
+
+    async def assign_issue(self, key, assignee=None):
+        """Assign an issue."""
+        return await self._call(self.jira.assign_issue, key, assignee)
+
+    async def resolve_issue(self, key, assignee=None, comment=None):
+        """Resolve issue."""
+        return await self._call(self.jira.resolve_issue, key, assignee, comment)
+
+    async def close_issue(self, key, assignee=None, comment=None):
+        """Close issue and subtasks (see Jira.close_issue).
+
+            The subtasks are closed concurrently before the issue itself.
+
+            :returns: True if transition succeeded, False if not
+            :rtype: bool
+        """
+        issue = await self.get_issue(key)
+
+        if not issue:
+            self.logger.debug("issue %s not accessible or not found", key)
+            return False
+
+        await asyncio.gather(*[self.close_issue(subtask["key"]) for subtask in issue["fields"]["subtasks"]])
+        return await self._call(self.jira.close_issue, key, assignee, comment, subtasks=False, issue=issue)
+
+    async def close_issues(self, keys, assignee=None, comment=None):
+        """Close issues concurrently.
+
+            :returns: The list of results (True if transition succeeded, False if not).
+        """
+        return await asyncio.gather(*[self.close_issue(key, assignee, comment) for key in keys])
+
+    async def reopen_issue(self, key, assignee=None, comment=None):
+        """Reopen issue."""
+        return await self._call(self.jira.reopen_issue, key, assignee, comment)
+
+    async def add_comment(self, key, comment):
+        """Add comment to an issue."""
+        return await self._call(self.jira.add_comment, key, comment)
+
+    async def get_attachments(self, key):
+        """Get all attachments of an issue."""
+        return await self._call(self.jira.get_attachments, key)
+
+    async def get_attachment(self, attachment_id):
+        """Get attachment by id."""
+        return await self._call(self.jira.get_attachment, attachment_id)
+
+    async def add_attachment(self, key, attachment, filename=None):
+        """Add attachment to an issue."""
+        return await self._call(self.jira.add_attachment, key, attachment, filename)
+
+    async def rem_attachments(self, key):
+        """Remove all attachments of an issue, the attachments are deleted concurrently.
+
+            :returns: True if succeeded, False if not
+            :rtype: bool
+        """
+        attachments = await self.get_attachments(key)
+        path = self.jira.api + "/attachment/{0}"
+        responses = await asyncio.gather(*[self._call(self.jira._delete_data, path.format(urllib.parse.quote_plus(att["id"] or "")), headers={**self.jira.headers})
+                                           for att in attachments])
+        return not any(isinstance(response, dict) and response.get("error") for response in responses)
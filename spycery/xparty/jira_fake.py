@@ -0,0 +1,402 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""This module provides a local stand-in for the JIRA rest api serving synthetic data."""
+
+# standard
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import json
+import logging
+import random
+import re
+import socketserver
+import threading
+import time
+import urllib.parse
+
+
+STATUSES = [("1", "Open"), ("3", "In Progress"), ("10609", "In Review"), ("5", "Resolved"), ("6", "Closed")]
+TYPES = [("1", "Bug"), ("3", "Task"), ("4", "Improvement"), ("10001", "Story")]
+
+
+def _timestamp(dtm):
+    """Return the jira representation of a datetime (e.g. 2017-02-17T10:00:00.000+0000)."""
+    return dtm.strftime("%Y-%m-%dT%H:%M:%S.000+0000")
+
+
+class FakeJiraData(object):
+    """The FakeJiraData class.
+
+       Generates synthetic boards, sprints and issues (incl. worklogs, comments and changelogs).
+       Issues are generated deterministically on demand, only the attributes needed for searching are kept in memory.
+    """
+
+    def __init__(self, num_issues=1000, num_boards=2, num_sprints=6, num_users=20, seed=0, now=None):
+        """Construct a new instance.
+
+            :param int num_issues: The number of issues.
+            :param int num_boards: The number of boards (each with its own project).
+            :param int num_sprints: The number of sprints per board (the last one is the active one, another future one is added).
+            :param int num_users: The number of users.
+            :param int seed: The random seed.
+            :param datetime now: The reference time, sprints are placed right before.
+        """
+        self.num_issues = num_issues
+        self.num_boards = max(1, num_boards)
+        self.num_sprints = max(1, num_sprints)
+        self.num_users = max(1, num_users)
+        self.seed = seed
+        self.now = now or datetime.now().replace(microsecond=0)
+
+        self.boards = [{"id": b + 1, "name": "Board {0}".format(b + 1), "type": "scrum"} for b in range(self.num_boards)]
+        self.sprints = {}
+        for board in self.boards:
+            sprints = []
+            for s in range(self.num_sprints + 1):
+                start = self.now - timedelta(days=14 * (self.num_sprints - s)) + timedelta(days=1)
+                state = "closed" if s < self.num_sprints - 1 else "active" if s == self.num_sprints - 1 else "future"
+                sprints.append({"id": board["id"] * 1000 + s + 1,
+                                "name": "Sprint {0}".format(s + 1),
+                                "state": state,
+                                "originBoardId": board["id"],
+                                "startDate": _timestamp(start),
+                                "endDate": _timestamp(start + timedelta(days=13))})
+            self.sprints[board["id"]] = sprints
+
+        # keep only what's needed for searching: (project, sprint id, created, worklog dates, worklog authors)
+        self.index = [self._meta(i) for i in range(num_issues)]
+        self.keys = {self.key(i): i for i in range(num_issues)}
+
+    def _random(self, i, salt=0):
+        return random.Random((self.seed * 1000003 + i) * 2 + salt)
+
+    def _meta(self, i):
+        rng = self._random(i)
+        board = self.boards[i % self.num_boards]
+        sprint = self.sprints[board["id"]][rng.randrange(self.num_sprints)]
+        start = datetime.strptime(sprint["startDate"][:19], "%Y-%m-%dT%H:%M:%S")
+        created = start + timedelta(days=rng.randrange(14), hours=rng.randrange(24))
+        worklogs = []
+        for _ in range(rng.randrange(4)):
+            worklogs.append((min(created + timedelta(days=rng.randrange(14), hours=rng.randrange(8)), self.now),
+                             rng.randrange(self.num_users),
+                             900 * rng.randrange(1, 17)))
+        return ("P{0}".format(board["id"]), sprint["id"], created, worklogs)
+
+    def key(self, i):
+        """Return the key of issue with given index."""
+        return "P{0}-{1}".format(i % self.num_boards + 1, i + 1)
+
+    def user(self, u):
+        """Return the user data of user with given index."""
+        name = "user.{0}".format(u)
+        return {"key": name, "name": name, "emailAddress": "{0}@example.com".format(name), "displayName": "User {0}".format(u)}
+
+    def issue(self, i, fields=None, expand=None):
+        """Return the issue data of issue with given index.
+
+            :param int i: The issue index.
+            :param fields: The optional set of fields to be returned (all if empty).
+            :param expand: The optional set of entities to be expanded.
+        """
+        project, sprint_id, created, worklogs = self.index[i]
+        rng = self._random(i, salt=1)
+        status = rng.randrange(len(STATUSES))
+        issuetype = TYPES[rng.randrange(len(TYPES))]
+        original = 3600 * rng.randrange(0, 17)
+        remaining = 0 if status >= 3 else 3600 * rng.randrange(0, 9)
+        reporter = self.user(rng.randrange(self.num_users))
+        key = self.key(i)
+
+        comments = []
+        for c in range(rng.randrange(3)):
+            comments.append({"id": str((i + 1) * 10 + c),
+                             "author": self.user(rng.randrange(self.num_users)),
+                             "body": "comment {0} on {1}".format(c + 1, key),
+                             "created": _timestamp(created + timedelta(hours=c + 1)),
+                             "updated": _timestamp(created + timedelta(hours=c + 1))})
+
+        values = {
+            "summary": "Synthetic issue {0}".format(key),
+            "project": {"key": project},
+            "issuetype": {"id": issuetype[0], "name": issuetype[1]},
+            "status": {"id": STATUSES[status][0], "name": STATUSES[status][1]},
+            "created": _timestamp(created),
+            "reporter": reporter,
+            "assignee": reporter,
+            "timeoriginalestimate": original or None,
+            "timetracking": {"originalEstimateSeconds": original, "remainingEstimateSeconds": remaining},
+            "subtasks": [],
+            "attachment": [],
+            "customfield_10000": [sprint_id],
+            "worklog": {"startAt": 0, "maxResults": 20, "total": len(worklogs),
+                        "worklogs": [{"id": str((i + 1) * 10 + w),
+                                      "author": self.user(author),
+                                      "started": _timestamp(date),
+                                      "updated": _timestamp(date),
+                                      "timeSpentSeconds": seconds} for w, (date, author, seconds) in enumerate(worklogs)]},
+            "comment": {"startAt": 0, "maxResults": len(comments), "total": len(comments), "comments": comments},
+        }
+
+        issue = {"id": str(i + 1), "key": key, "self": "issue/{0}".format(i + 1),
+                 "fields": {k: v for k, v in values.items() if not fields or k in fields}}
+
+        if expand and "changelog" in expand:
+            histories = []
+            date = created
+            for s in range(1, status + 1):
+                date = min(date + timedelta(hours=rng.randrange(1, 72)), self.now)
+                histories.append({"id": str((i + 1) * 10 + s),
+                                  "created": _timestamp(date),
+                                  "items": [{"field": "status", "fieldtype": "jira",
+                                             "from": STATUSES[s - 1][0], "fromString": STATUSES[s - 1][1],
+                                             "to": STATUSES[s][0], "toString": STATUSES[s][1]}]})
+            issue["changelog"] = {"startAt": 0, "maxResults": len(histories), "total": len(histories), "histories": histories}
+
+        return issue
+
+    def search(self, jql):
+        """Return the indices of issues matching the (simple) JQL string.
+
+            Supported are AND-combined clauses on project, key, sprint, created, worklogDate and worklogAuthor.
+            Other clauses are ignored, i.e. they match all issues.
+        """
+        jql = re.sub(r"\border\s+by\b.*$", "", jql or "", flags=re.IGNORECASE | re.DOTALL)
+        filters = []
+        for clause in re.split(r"\s+and\s+", jql, flags=re.IGNORECASE):
+            match = re.match(r"^\(*\s*(\w+)\s*(>=|<=|!=|=|<|>|\bin\b)\s*(.+?)\s*\)*$", clause.strip(), flags=re.IGNORECASE)
+            if match:
+                filters.append(self._filter(match.group(1).lower(), match.group(2).lower(), match.group(3)))
+
+        return [i for i in range(self.num_issues) if all(f(i) for f in filters if f is not None)]
+
+    def _filter(self, field, op, value):
+        values = [v.strip().strip("\"'") for v in value.strip("()").split(",")] if op == "in" else [value.strip("\"'")]
+        compare = {"=": lambda a, b: a == b, "!=": lambda a, b: a != b, ">=": lambda a, b: a >= b, "<=": lambda a, b: a <= b,
+                   ">": lambda a, b: a > b, "<": lambda a, b: a < b, "in": lambda a, b: a in b}[op]
+        operand = values if op == "in" else values[0]
+
+        if field == "project":
+            return lambda i: compare(self.index[i][0], operand)
+        if field == "key":
+            return lambda i: compare(self.key(i), operand)
+        if field == "sprint":
+            operand = [int(v) for v in values] if op == "in" else int(values[0])
+            return lambda i: compare(self.index[i][1], operand)
+        if field in ("created", "worklogdate"):
+            date = datetime.strptime(values[0][:10], "%Y-%m-%d")
+            if field == "created":
+                return lambda i: compare(self.index[i][2], date)
+            return lambda i: any(compare(w[0], date) for w in self.index[i][3])
+        if field == "worklogauthor":
+            return lambda i: any(compare("user.{0}".format(w[1]), operand) for w in self.index[i][3])
+        return None
+
+
+class FakeJiraServer(threading.Thread):
+    """The FakeJiraServer class.
+
+       Serves synthetic data via (a subset of) the JIRA rest api, i.e. search, agile board/sprint, issue, worklog, comment,
+       changelog, transition and greenhopper sprint report endpoints. Can be used to test and benchmark the Jira class locally.
+
+       Example:
+
+       server = FakeJiraServer(num_issues=10000, latency=0.01, max_results=100)
+       server.start()
+       session = Jira(server.url, "username", "password")
+       session.get_sprint_worklog("Board 1")
+       server.stop()
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._host = kwargs.pop("host", None) or "127.0.0.1"
+        self._port = kwargs.pop("port", None) or 0
+        self.latency = kwargs.pop("latency", None) or 0.0
+        self.max_results = kwargs.pop("max_results", None) or 100
+        options = {name: kwargs.pop(name) for name in ("num_issues", "num_boards", "num_sprints", "num_users", "seed") if name in kwargs}
+        self.data = kwargs.pop("data", None) or FakeJiraData(**options)
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._lock = threading.Lock()
+        self._requests = {}
+        self._searches = {}
+        self._transitions = {}
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def log_message(self, format, *args):
+                server.logger.debug(format, *args)
+
+            def do_GET(self):
+                server._handle(self, "GET")
+
+            def do_POST(self):
+                server._handle(self, "POST")
+
+            def do_PUT(self):
+                server._handle(self, "PUT")
+
+            def do_DELETE(self):
+                server._handle(self, "DELETE")
+
+        class Server(socketserver.ThreadingMixIn, HTTPServer):
+            daemon_threads = True
+
+        self._httpd = Server((self._host, self._port), Handler)
+        super().__init__(*args, daemon=True, **kwargs)
+
+    @property
+    def url(self):
+        """The server URL including the scheme."""
+        return "http://{0}:{1}".format(*self._httpd.server_address[:2])
+
+    @property
+    def request_count(self):
+        """The total number of requests served so far."""
+        with self._lock:
+            return sum(self._requests.values())
+
+    def request_counts(self):
+        """Return the number of requests served so far per route."""
+        with self._lock:
+            return dict(self._requests)
+
+    def reset_counts(self):
+        """Reset the request counters."""
+        with self._lock:
+            self._requests = {}
+
+    def run(self):
+        self._httpd.serve_forever(poll_interval=0.1)
+
+    def stop(self):
+        """Stop serving and release the socket."""
+        if self.is_alive():
+            self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _handle(self, handler, method):
+        url = urllib.parse.urlsplit(handler.path)
+        query = {k: v[-1] for k, v in urllib.parse.parse_qs(url.query, keep_blank_values=True).items()}
+        path = url.path.strip("/")
+        body = None
+        if handler.headers.get("Content-Length"):
+            body = handler.rfile.read(int(handler.headers["Content-Length"]))
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        route, status, result = self._route(method, path, query, body)
+        with self._lock:
+            self._requests[route] = self._requests.get(route, 0) + 1
+
+        data = b"" if result is None else json.dumps(result).encode("utf-8")
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def _page(self, values, query, page_size=50):
+        start = int(query.get("startAt") or 0)
+        count = min(int(query.get("maxResults") or page_size), page_size)
+        page = values[start:start + count]
+        return {"startAt": start, "maxResults": count, "total": len(values), "isLast": start + len(page) >= len(values), "values": page}
+
+    def _route(self, method, path, query, body):
+        data = self.data
+        parts = path.split("/")
+
+        if path == "rest/api/2/search":
+            jql = query.get("jql", "")
+            with self._lock:
+                found = self._searches.get(jql)
+            if found is None:
+                found = data.search(jql)
+                with self._lock:
+                    self._searches[jql] = found
+            start = int(query.get("startAt") or 0)
+            count = min(int(query.get("maxResults") or 0), self.max_results)
+            fields = {f.strip() for f in query.get("fields", "").split(",") if f.strip()}
+            expand = {e.strip() for e in query.get("expand", "").split(",") if e.strip()}
+            issues = [data.issue(i, fields, expand) for i in found[start:start + count]]
+            return "search", 200, {"startAt": start, "maxResults": count, "total": len(found), "issues": issues}
+
+        if path == "rest/agile/1.0/board":
+            return "board", 200, self._page(data.boards, query)
+
+        if len(parts) == 6 and parts[:4] == ["rest", "agile", "1.0", "board"] and parts[5] in ("project", "sprint"):
+            board_id = int(parts[4])
+            if board_id not in data.sprints:
+                return "board/" + parts[5], 404, {"errorMessages": ["board not found"]}
+            if parts[5] == "project":
+                return "board/project", 200, self._page([{"key": "P{0}".format(board_id), "name": "Project {0}".format(board_id)}], query)
+            return "board/sprint", 200, self._page(data.sprints[board_id], query)
+
+        if path == "rest/greenhopper/latest/rapid/charts/sprintreport":
+            return "sprintreport", 200, self._sprint_report(int(query.get("rapidViewId") or 0), int(query.get("sprintId") or 0))
+
+        if len(parts) >= 5 and parts[:4] == ["rest", "api", "2", "issue"]:
+            key = urllib.parse.unquote_plus(parts[4])
+            if key not in data.keys:
+                return "issue", 404, {"errorMessages": ["Issue does not exist or you do not have permission to see it."]}
+            i = data.keys[key]
+            sub = parts[5] if len(parts) > 5 else ""
+            if method == "GET" and sub == "":
+                fields = {f.strip() for f in query.get("fields", "").split(",") if f.strip()}
+                expand = {e.strip() for e in query.get("expand", "").split(",") if e.strip()}
+                return "issue", 200, data.issue(i, fields, expand)
+            if method == "GET" and sub in ("worklog", "comment"):
+                values = data.issue(i, {sub})["fields"][sub]
+                values = values["worklogs" if sub == "worklog" else "comments"]
+                page = self._page(values, query, page_size=1000)
+                return "issue/" + sub, 200, {"startAt": page["startAt"], "maxResults": page["maxResults"], "total": page["total"],
+                                              "worklogs" if sub == "worklog" else "comments": page["values"]}
+            if method == "GET" and sub == "changelog":
+                histories = data.issue(i, {"status"}, {"changelog"})["changelog"]["histories"]
+                return "issue/changelog", 200, self._page(histories, query, page_size=100)
+            if sub == "transitions":
+                return "issue/transitions", 200, self._transition(i, method, body)
+            if method in ("PUT", "POST"):
+                return "issue/" + (sub or "update"), 204, None
+            return "issue", 405, {"errorMessages": ["method not allowed"]}
+
+        return "unknown", 404, {"errorMessages": ["route {0} {1} not supported".format(method, path)]}
+
+    def _transition(self, i, method, body):
+        with self._lock:
+            status = self._transitions.get(i)
+        if status is None:
+            status = self.data.issue(i, {"status"})["fields"]["status"]["name"]
+        if method == "POST":
+            transition = json.loads(body or b"{}").get("transition", {}).get("id")
+            status = {"11": "In Progress", "21": "Resolved", "31": "Closed", "41": "Open"}.get(transition, status)
+            with self._lock:
+                self._transitions[i] = status
+            return None
+        names = {"Open": [("11", "Start Progress"), ("21", "Resolve Issue"), ("31", "Close Issue")],
+                 "In Progress": [("21", "Resolve Issue"), ("31", "Close Issue")],
+                 "In Review": [("21", "Resolve Issue"), ("31", "Close Issue")],
+                 "Resolved": [("31", "Close Issue"), ("41", "Reopen Issue")],
+                 "Closed": [("41", "Reopen Issue")]}[status]
+        return {"transitions": [{"id": tid, "name": name} for tid, name in names]}
+
+    def _sprint_report(self, board_id, sprint_id):
+        data = self.data
+        issues = [i for i in range(data.num_issues) if data.index[i][1] == sprint_id]
+        contents = {"completedIssues": [], "issuesNotCompletedInCurrentSprint": [], "puntedIssues": [], "issueKeysAddedDuringSprint": {}}
+        for i in issues:
+            issue = data.issue(i, {"summary", "status", "issuetype"})
+            entry = {"key": issue["key"], "summary": issue["fields"]["summary"],
+                     "typeId": issue["fields"]["issuetype"]["id"], "statusId": issue["fields"]["status"]["id"]}
+            if issue["fields"]["status"]["name"] in ("Resolved", "Closed"):
+                contents["completedIssues"].append(entry)
+            elif i % 7 == 0:
+                contents["puntedIssues"].append(entry)
+            else:
+                contents["issuesNotCompletedInCurrentSprint"].append(entry)
+            if i % 5 == 0:
+                contents["issueKeysAddedDuringSprint"][issue["key"]] = True
+        return {"contents": contents, "sprint": {"id": sprint_id}}
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""This module provides a local index over JIRA issue summaries and comments."""
+
+# standard
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import logging
+import re
+import sqlite3
+import threading
+
+# local
+from spycery.xparty.jira import plan_search
+
+
+def _tokenize(text):
+    """Return the set of lowercase word tokens of a text."""
+    return set(re.findall(r"\w+", (text or "").lower()))
+
+
+class JiraCommentIndex(object):
+    """The JiraCommentIndex class.
+
+       Maps comment authors and summary/comment tokens to issue keys and comment ids.
+       The index is persisted in a sqlite database, so lookups answer without re-crawling JIRA.
+
+       Example:
+
+       index = JiraCommentIndex("comments.db")
+       index.sync(session, "project = ABC")   # only issues updated since the last sync are fetched again
+       index.get_issues_commented_by_author("prename.surname")
+       index.search("database timeout")
+    """
+
+    def __init__(self, path=":memory:"):
+        """Construct a new instance.
+
+            :param str path: The database file path (default is an in-memory database).
+        """
+        self.path = path
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.executescript("""
+                CREATE TABLE IF NOT EXISTS issues (key TEXT PRIMARY KEY, summary TEXT, updated TEXT);
+                CREATE TABLE IF NOT EXISTS comments (id TEXT PRIMARY KEY, issue TEXT, author TEXT, created TEXT, body TEXT);
+                CREATE TABLE IF NOT EXISTS tokens (token TEXT, issue TEXT, comment TEXT);
+                CREATE TABLE IF NOT EXISTS syncs (search_mask TEXT PRIMARY KEY, synced TEXT);
+                CREATE INDEX IF NOT EXISTS comments_author ON comments (author);
+                CREATE INDEX IF NOT EXISTS comments_issue ON comments (issue);
+                CREATE INDEX IF NOT EXISTS tokens_token ON tokens (token);
+                CREATE INDEX IF NOT EXISTS tokens_issue ON tokens (issue);
+            """)
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM issues").fetchone()[0]
+
+    def close(self):
+        """Close the database."""
+        with self._lock:
+            self._db.close()
+
+    def add_issue(self, issue, comments=None):
+        """Add or replace an issue and its comments.
+
+            :param issue: The issue data (with fields summary, updated and comment).
+            :param comments: The optional complete list of comments (default is the comments contained in issue data).
+        """
+        self.update([(issue, comments)] if comments is not None else [issue])
+
+    def update(self, issues):
+        """Add or replace issues (e.g. as returned by Jira.iter_issues with fields summary, updated and comment).
+
+            :param issues: The iterable of issue data or (issue data, complete list of comments) tuples.
+
+            :returns: The number of issues updated.
+            :rtype: int
+        """
+        count = 0
+        with self._lock, self._db:
+            for issue in issues:
+                issue, comments = issue if isinstance(issue, tuple) else (issue, None)
+                self._add_issue(issue, comments)
+                count += 1
+        return count
+
+    def _add_issue(self, issue, comments=None):
+        fields = issue.get("fields") or {}
+        key = issue["key"]
+        if comments is None:
+            comments = (fields.get("comment") or {}).get("comments") or []
+
+        self._db.execute("DELETE FROM tokens WHERE issue = ?", (key,))
+        self._db.execute("DELETE FROM comments WHERE issue = ?", (key,))
+        self._db.execute("INSERT OR REPLACE INTO issues VALUES (?, ?, ?)", (key, fields.get("summary"), fields.get("updated")))
+        self._db.executemany("INSERT INTO tokens VALUES (?, ?, '')", [(token, key) for token in _tokenize(fields.get("summary"))])
+        for comment in comments:
+            author = (comment.get("author") or {}).get("key")
+            self._db.execute("INSERT OR REPLACE INTO comments VALUES (?, ?, ?, ?, ?)",
+                             (comment["id"], key, author, comment.get("created"), comment.get("body")))
+            self._db.executemany("INSERT INTO tokens VALUES (?, ?, ?)", [(token, key, comment["id"]) for token in _tokenize(comment.get("body"))])
+
+    def remove_issue(self, key):
+        """Remove an issue and its comments."""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM tokens WHERE issue = ?", (key,))
+            self._db.execute("DELETE FROM comments WHERE issue = ?", (key,))
+            self._db.execute("DELETE FROM issues WHERE key = ?", (key,))
+
+    def sync(self, jira, search_mask="", incremental=True, max_workers=8):
+        """Synchronize the index with issues matching the search mask (JQL string).
+
+            Comments beyond the first page of the search response are fetched concurrently.
+            The sync time is only recorded if all pages were read (see Jira.last_error), otherwise the next
+            incremental sync starts from the previous sync time again.
+
+            :param jira: The Jira instance.
+            :param str search_mask: The JQL string used to search for issues.
+            :param bool incremental: Only fetch issues updated since the last sync of the same search mask.
+            :param int max_workers: The max number of concurrent comment requests.
+
+            :returns: The number of issues synchronized.
+            :rtype: int
+        """
+        self.logger.debug("sync(\"%s\", \"%s\")", search_mask, incremental)
+
+        with self._lock:
+            row = self._db.execute("SELECT synced FROM syncs WHERE search_mask = ?", (search_mask,)).fetchone()
+
+        started = datetime.now()
+        search = search_mask
+        if incremental and row is not None:
+            search = plan_search(search_mask, start_date=datetime.strptime(row[0], "%Y-%m-%dT%H:%M:%S"), date_field="updated")
+
+        count = 0
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for _, issues in jira.iter_issue_pages(search_mask=search, fields="summary,updated,comment"):
+                pending = []
+                for issue in issues:
+                    comment = (issue.get("fields") or {}).get("comment") or {}
+                    if comment.get("total", 0) > len(comment.get("comments") or []):
+                        pending.append((issue, executor.submit(jira.get_comments, issue["key"])))
+                    else:
+                        pending.append((issue, None))
+                # one transaction per page
+                count += self.update((issue, comments.result()) if comments is not None else issue for issue, comments in pending)
+
+        if jira.last_error is not None:
+            # issues after the failed page weren't fetched, the next sync has to fetch them again
+            self.logger.debug("sync incomplete. %s", jira.last_error)
+            return count
+
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO syncs VALUES (?, ?)", (search_mask, started.strftime("%Y-%m-%dT%H:%M:%S")))
+
+        return count
+
+    def get_issues_commented_by_author(self, author):
+        """Return a list of indexed issues commented by author (see Jira.get_issues_commented_by_author).
+
+            :param str author: The author's name respectively key (lowercase, e.g. "prename.surname")
+
+            :returns: The list of issues found including the comments.
+            :rtype: list(issue key, comments)
+        """
+        with self._lock:
+            rows = self._db.execute("SELECT issue, created, body FROM comments WHERE author = ? ORDER BY issue, created", (author,)).fetchall()
+
+        list_of_comments = []
+        for issue, created, body in rows:
+            if not list_of_comments or list_of_comments[-1][0] != issue:
+                list_of_comments.append((issue, []))
+            list_of_comments[-1][1].append((created, body))
+        return list_of_comments
+
+    def get_comment_ids_by_author(self, author):
+        """Return the dictionary with key=issue key and value=list of comment ids written by author."""
+        with self._lock:
+            rows = self._db.execute("SELECT issue, id FROM comments WHERE author = ? ORDER BY issue, created", (author,)).fetchall()
+
+        comment_ids = {}
+        for issue, comment_id in rows:
+            comment_ids.setdefault(issue, []).append(comment_id)
+        return comment_ids
+
+    def search(self, text, author=None):
+        """Return the issues and comments containing all words of text.
+
+            :param str text: The words to search for (case insensitive).
+            :param str author: The optional comment author to restrict the search to.
+
+            :returns: The dictionary with key=issue key and value=list of matching comment ids (empty if the summary matches).
+            :rtype: dict(string, list)
+        """
+        tokens = sorted(_tokenize(text))
+        if not tokens:
+            return {}
+
+        query = "SELECT issue, comment FROM tokens WHERE token IN ({0}) GROUP BY issue, comment HAVING COUNT(DISTINCT token) = ?".format(", ".join("?" * len(tokens)))
+        with self._lock:
+            rows = self._db.execute(query, (*tokens, len(tokens))).fetchall()
+            if author is not None:
+                authored = {row[0] for row in self._db.execute("SELECT id FROM comments WHERE author = ?", (author,))}
+                rows = [row for row in rows if row[1] in authored]
+
+        found = {}
+        for issue, comment in sorted(rows):
+            found.setdefault(issue, [])
+            if comment:
+                found[issue].append(comment)
+        return found
@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""This module provides a receiver for JIRA webhooks keeping a local issue cache up to date."""
+
+# standard
+import fnmatch
+import hmac
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import json
+import logging
+import os
+import socketserver
+import threading
+import time
+import urllib.parse
+import uuid
+
+
+class JiraIssueCache(object):
+    """The JiraIssueCache class.
+
+       Keeps issue and sprint data in process and optionally persists it to a json file.
+
+       Example:
+
+       cache = JiraIssueCache("issues.json")
+       cache.update(session.iter_issues("project = ABC", fields="summary,status,worklog"))
+       cache.save()
+    """
+
+    def __init__(self, path=None):
+        """Construct a new instance.
+
+            :param path: The optional json file path to load the cache from and save it to.
+        """
+        self.path = path
+        self.issues = {}
+        self.sprints = {}
+        self._ids = {}
+        self._lock = threading.RLock()
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        if path and os.path.exists(path):
+            self.load()
+
+    def __len__(self):
+        return len(self.issues)
+
+    def __contains__(self, key):
+        return key in self.issues
+
+    def get(self, key, default=None):
+        """Return the cached issue data of given issue key or id."""
+        with self._lock:
+            return self.issues.get(self._ids.get(key, key), default)
+
+    def update(self, issues):
+        """Add or replace issues (e.g. as returned by Jira.iter_issues).
+
+            :param issues: The iterable of issue data.
+
+            :returns: The number of issues updated.
+            :rtype: int
+        """
+        count = 0
+        with self._lock:
+            for issue in issues:
+                self._put(issue)
+                count += 1
+        return count
+
+    def apply(self, event):
+        """Apply a webhook event to the cache.
+
+            :param event: The webhook event data (json).
+
+            :returns: The list of changes as (event name, issue key or sprint id) tuples.
+        """
+        name = event.get("webhookEvent") or ""
+        changes = []
+
+        with self._lock:
+            if name.startswith("jira:issue_") and event.get("issue"):
+                issue = event["issue"]
+                if name == "jira:issue_deleted":
+                    self.issues.pop(issue.get("key"), None)
+                    self._ids.pop(str(issue.get("id")), None)
+                else:
+                    self._put(issue)
+                changes.append((name, issue.get("key")))
+
+            elif name.startswith("worklog_") and event.get("worklog"):
+                worklog = event["worklog"]
+                key = self._ids.get(str(worklog.get("issueId")), worklog.get("issueId"))
+                issue = self.issues.get(key)
+                if issue is not None:
+                    worklogs = issue.setdefault("fields", {}).setdefault("worklog", {"startAt": 0, "total": 0, "worklogs": []})
+                    entries = [w for w in worklogs.get("worklogs", []) if w.get("id") != worklog.get("id")]
+                    if name != "worklog_deleted":
+                        entries.append(worklog)
+                    worklogs["worklogs"] = entries
+                    worklogs["total"] = worklogs["maxResults"] = len(entries)
+                changes.append((name, key))
+
+            elif name.startswith("sprint_") and event.get("sprint"):
+                sprint = event["sprint"]
+                if name == "sprint_deleted":
+                    self.sprints.pop(sprint.get("id"), None)
+                else:
+                    self.sprints[sprint.get("id")] = sprint
+                changes.append((name, sprint.get("id")))
+
+            else:
+                self.logger.debug("event %s ignored", name)
+
+        return changes
+
+    def load(self):
+        """Load the cache from its json file."""
+        with self._lock, open(self.path, "r") as f:
+            data = json.load(f)
+            self.issues = {}
+            self._ids = {}
+            for issue in data.get("issues", []):
+                self._put(issue)
+            self.sprints = {sprint["id"]: sprint for sprint in data.get("sprints", [])}
+
+    def save(self):
+        """Save the cache to its json file (atomically)."""
+        if not self.path:
+            return
+        with self._lock:
+            filename = "{0}.{1}.tmp".format(self.path, os.getpid())
+            with open(filename, "w") as f:
+                json.dump({"issues": list(self.issues.values()), "sprints": list(self.sprints.values())}, f)
+            os.replace(filename, self.path)
+
+    def _put(self, issue):
+        self.issues[issue["key"]] = issue
+        if issue.get("id") is not None:
+            self._ids[str(issue["id"])] = issue["key"]
+
+
+class JiraWebhookReceiver(threading.Thread):
+    """The JiraWebhookReceiver class.
+
+       Receives JIRA webhook events (issue, worklog and sprint events), applies them to an issue cache
+       and notifies subscribers. Register http://<host>:<port>/?token=<token> as webhook in JIRA.
+       Changes are saved to the cache file at most every save_interval seconds while running and on stop.
+
+       Example:
+
+       receiver = JiraWebhookReceiver(port=8765, cache=JiraIssueCache("issues.json"), token="secret", save_interval=5.0)
+       receiver.subscribe(lambda name, key, event: print(name, key), events=["jira:issue_*", "worklog_*"])
+       receiver.start()
+
+       ...
+
+       receiver.stop()
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._host = kwargs.pop("host", None) or "127.0.0.1"
+        self._port = kwargs.pop("port", None) or 0
+        self._token = kwargs.pop("token", None)
+        self._save_interval = kwargs.pop("save_interval", 1.0)
+        self.cache = kwargs.pop("cache", None)
+        if self.cache is None:
+            self.cache = JiraIssueCache()
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+        self._dirty = False
+        self._saved = time.monotonic()
+
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def log_message(self, format, *args):
+                receiver.logger.debug(format, *args)
+
+            def do_POST(self):
+                query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+                token = query.get("token", [""])[-1]
+                if receiver._token is not None and not hmac.compare_digest(token.encode("utf-8"), receiver._token.encode("utf-8")):
+                    self.send_response(403)
+                    self.end_headers()
+                    return
+                try:
+                    event = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+                except ValueError as ex:
+                    receiver.logger.debug("invalid event. %s", ex)
+                    event = None
+                if not isinstance(event, dict):
+                    self.send_response(400)
+                    self.end_headers()
+                    return
+                self.send_response(204)
+                self.end_headers()
+                receiver.receive(event)
+
+        class Server(socketserver.ThreadingMixIn, HTTPServer):
+            daemon_threads = True
+
+            def service_actions(self):
+                receiver.flush()
+
+        self._httpd = Server((self._host, self._port), Handler)
+        super().__init__(*args, daemon=True, **kwargs)
+
+    @property
+    def url(self):
+        """The receiver URL including the scheme (and token)."""
+        url = "http://{0}:{1}/".format(*self._httpd.server_address[:2])
+        return url if self._token is None else "{0}?token={1}".format(url, urllib.parse.quote_plus(self._token))
+
+    def subscribe(self, callback, events=None):
+        """Subscribe to changes.
+
+            :param callback: The callable getting (event name, issue key or sprint id, event data).
+            :param events: The optional list of event names or patterns (e.g. "jira:issue_*", "worklog_created").
+
+            :returns: The subscription id.
+        """
+        subscription = str(uuid.uuid4())
+        with self._lock:
+            self._subscriptions[subscription] = (callback, list(events or ["*"]))
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Unsubscribe from changes.
+
+            :param subscription: The subscription id.
+        """
+        with self._lock:
+            self._subscriptions.pop(subscription, None)
+
+    def receive(self, event):
+        """Apply an event to the cache and notify subscribers.
+
+            Called for each posted event, but can be called directly as well (e.g. for replaying events).
+
+            :param event: The webhook event data (json).
+        """
+        changes = self.cache.apply(event)
+
+        with self._lock:
+            self._dirty = self._dirty or bool(changes)
+            subscriptions = list(self._subscriptions.values())
+
+        for name, key in changes:
+            for callback, events in subscriptions:
+                if any(fnmatch.fnmatchcase(name, pattern) for pattern in events):
+                    try:
+                        callback(name, key, event)
+                    except Exception as ex:
+                        self.logger.debug("subscriber failed. %s", ex)
+
+    def flush(self, force=False):
+        """Save the cache if it changed and save_interval has elapsed since the last save.
+
+            :param force: Save pending changes regardless of the interval.
+        """
+        with self._lock:
+            if not self._dirty or (not force and time.monotonic() - self._saved < self._save_interval):
+                return
+            self._dirty = False
+            self._saved = time.monotonic()
+        try:
+            self.cache.save()
+        except (IOError, OSError) as ex:
+            self.logger.debug("saving cache failed. %s", ex)
+            with self._lock:
+                self._dirty = True
+
+    def run(self):
+        self._httpd.serve_forever(poll_interval=0.1)
+
+    def stop(self):
+        """Stop receiving, release the socket and save the cache."""
+        if self.is_alive():
+            self._httpd.shutdown()
+        self._httpd.server_close()
+        self.cache.save()
@@ -4,13 +4,193 @@
 """This module provides extensions for handling QlikSense apps."""
 
 import os
+import glob
+import hashlib
+import itertools
 import json
 import logging
+import re
 import uuid
 import shutil
+import threading
+import time
 
 # needs websocket-client
-from websocket import create_connection
+from websocket import create_connection, WebSocketException, WebSocketTimeoutException
+
+# engine error: app already open (a session can hold only one open app)
+LOCERR_APP_ALREADY_OPEN = 1002
+
+# max number of cells the engine returns per GetHyperCubeData page
+MAX_CELLS = 10000
+
+# ioctl request cloning a file (linux)
+FICLONE = 0x40049409
+
+
+def fingerprint_sources(sources, method="stat"):
+    """Return the fingerprint of data source files.
+
+       :param sources: The list of file paths or glob patterns.
+       :param method: "stat" (size and modification time) or "hash" (size and sha256 of the content).
+       :returns: The dictionary with key=absolute path and value=fingerprint (None if the file is missing).
+    """
+    paths = set()
+    for source in sources:
+        matches = glob.glob(source)
+        # keep missing files, they are part of the fingerprint as well
+        paths.update(matches if matches or glob.has_magic(source) else [source])
+
+    fingerprint = {}
+    for path in sorted(os.path.abspath(path) for path in paths):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            fingerprint[path] = None
+            continue
+        if method == "hash":
+            sha256 = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    sha256.update(chunk)
+            fingerprint[path] = [stat.st_size, sha256.hexdigest()]
+        else:
+            fingerprint[path] = [stat.st_size, stat.st_mtime_ns]
+    return fingerprint
+
+
+def stage_file(source, target):
+    """Copy a file avoiding to copy the data through user space where the filesystem allows it.
+
+       Tries a reflink (copy-on-write clone, e.g. btrfs, xfs), then copy_file_range (in-kernel resp. server-side copy)
+       and falls back to shutil.copyfile (which uses the fast copy of the platform, e.g. sendfile or CopyFile on Windows).
+
+       :returns: The method used ("reflink", "copy_file_range" or "copy").
+    """
+    with open(source, "rb") as fsrc, open(target, "wb") as fdst:
+        try:
+            # needs linux
+            import fcntl
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            return "reflink"
+        except (ImportError, OSError):
+            pass
+
+        copy_file_range = getattr(os, "copy_file_range", None)
+        if copy_file_range is not None:
+            try:
+                size = os.fstat(fsrc.fileno()).st_size
+                offset = 0
+                while offset < size:
+                    copied = copy_file_range(fsrc.fileno(), fdst.fileno(), size - offset, offset, offset)
+                    if copied == 0:
+                        break
+                    offset += copied
+                if offset == size:
+                    return "copy_file_range"
+            except OSError:
+                pass
+
+    shutil.copyfile(source, target)
+    return "copy"
+
+
+class ReloadProgress(object):
+    """The ReloadProgress class.
+
+       Turns the GetProgress data polled during a reload into progress events (dicts with key "event"):
+       - "line": a script log line (text, elapsed)
+       - "transient": the current transient progress text (text, elapsed)
+       - "statement": a finished load statement (table, source, rows, elapsed, duration)
+       Elapsed times are seconds since the reload started, durations are measured at polling resolution.
+    """
+
+    TABLE = re.compile(r"^\s*(\S.*?)\s+<<\s+(.*?)(?:\s+[\d,.']+\s+(?:lines|rows)\s+fetched.*)?$", re.IGNORECASE)
+    ROWS = re.compile(r"([\d,.']+)\s+(?:lines|rows)\s+fetched|(?:lines|rows)\s+fetched:?\s*([\d,.']+)", re.IGNORECASE)
+
+    def __init__(self, callback=None):
+        """Construct a new instance.
+
+           :param callback: The optional callable getting each progress event.
+        """
+        self.callback = callback
+        self.started = time.perf_counter()
+        self.statements = []
+        self._table = None
+        self._transient = ""
+        self._last = 0.0
+
+    def _emit(self, event):
+        if self.callback is not None:
+            self.callback(event)
+
+    def update(self, data):
+        """Process GetProgress data (qProgressData)."""
+        elapsed = time.perf_counter() - self.started
+
+        for line in (data.get("qPersistentProgress") or "").splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            self._emit({"event": "line", "text": line, "elapsed": elapsed})
+
+            match = self.TABLE.match(line)
+            if match:
+                self._table = (match.group(1), match.group(2))
+
+            match = self.ROWS.search(line)
+            if match:
+                rows = int(re.sub(r"\D", "", match.group(1) or match.group(2)) or 0)
+                table, source = self._table or (None, None)
+                statement = {"event": "statement", "table": table, "source": source, "rows": rows,
+                             "elapsed": elapsed, "duration": elapsed - self._last}
+                self.statements.append(statement)
+                self._emit(statement)
+                self._table = None
+                self._last = elapsed
+
+        transient = data.get("qTransientProgress") or ""
+        if transient != self._transient:
+            self._transient = transient
+            if transient:
+                self._emit({"event": "transient", "text": transient, "elapsed": elapsed})
+
+
+class QlikFingerprints(object):
+    """The QlikFingerprints class.
+
+       Stores the data source fingerprints of the last successful reload per app in a json file.
+       One instance can be shared by several Qlik instances (e.g. by QlikReloadScheduler).
+    """
+
+    def __init__(self, path, method="stat"):
+        """Construct a new instance.
+
+           :param path: The json file path.
+           :param method: "stat" (size and modification time) or "hash" (size and sha256 of the content).
+        """
+        self.path = path
+        self.method = method
+        self.apps = {}
+        self._lock = threading.Lock()
+
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                self.apps = json.load(f)
+
+    def get(self, app):
+        """Return the stored fingerprint of an app or None."""
+        with self._lock:
+            return self.apps.get(app)
+
+    def set(self, app, fingerprint):
+        """Store the fingerprint of an app and save the json file (atomically)."""
+        with self._lock:
+            self.apps[app] = fingerprint
+            filename = "{0}.{1}.tmp".format(self.path, os.getpid())
+            with open(filename, "w") as f:
+                json.dump(self.apps, f)
+            os.replace(filename, self.path)
 
 
 class Qlik(object):
@@ -26,48 +206,219 @@ class Qlik(object):
        4. Use this class f.e. to reload apps from within python code to update included data
           qlik = Qlik()
           qlik.reloadApp("QlikSense App.qvf")
+
+       In session mode one engine connection is kept alive (by heartbeats) across many reloads,
+       it is re-established automatically if it drops.
+
+          with Qlik() as qlik:
+              for app in apps:
+                  qlik.reload_app(app)
+
+       An engine session holds only one open app (QlikSense Desktop), so in session mode a reload of another app
+       still needs a new connection (one handshake per distinct app). Saved are the default app folder request,
+       the failed OpenDoc request (once the engine reported it, see single_app) and, for repeated reloads
+       of the same app, the connection and OpenDoc. An app given by path is staged as a copy in the app folder,
+       the engine keeps it open until its session ends, so the connection is closed right after the reload to remove
+       the copy (each staged reload needs a new connection).
+
+       With fingerprints apps are reloaded only if one of their declared data sources changed.
+
+          qlik = Qlik(fingerprints="fingerprints.json")
+          qlik.reload_app("Sales.qvf", sources=["data/sales_*.csv"])
     """
 
-    def __init__(self, server="localhost:4848"):
+    def __init__(self, server="localhost:4848", heartbeat=30.0, fingerprints=None, single_app=None):
+        """Construct a new instance.
+
+           :param server: The engine host and port.
+           :param heartbeat: The interval in seconds of websocket pings in session mode (0 disables heartbeats).
+           :param fingerprints: The optional QlikFingerprints instance or json file path storing data source fingerprints.
+           :param single_app: True if a session can hold only one open app (a new connection is made before opening
+                              another app), False if it can hold several. None (default) learns it from the engine
+                              error of the first failed attempt.
+        """
         # self.base_url = "ws://localhost:4848/app/{0}?reloadUri=http://localhost:4848/dev-hub/engine-api-explorer"
         self.base_url = "ws://{0}/app/%3Ftransient%3D?reloadUri=http://{0}/dev-hub/engine-api-explorer".format(server)
+        self.server = server
         self.ws = None
+        self.heartbeat = heartbeat
+        self.connects = 0
+        self.last_error = None
+        self.last_skipped = False
+        self.last_timings = {}
+        self.last_statements = []
+        self.fingerprints = QlikFingerprints(fingerprints) if isinstance(fingerprints, str) else fingerprints
+        self._ids = itertools.count(1)
         self.logger = logging.getLogger(self.__class__.__name__)
+        self._lock = threading.RLock()
+        # serializes the frames sent by requests and heartbeats (pings don't wait for a running request)
+        self._send_lock = threading.Lock()
+        self._session = False
+        self._app_folder = None
+        self._doc = None
+        self._single_app = single_app
+        self._stop_heartbeat = threading.Event()
+        self._heartbeat_thread = None
+
+    def __enter__(self):
+        self.open_session()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close_session()
 
     def connect(self):
         """Create connection."""
-        try:
-            # self.ws = create_connection(self.base_url.format(urllib.parse.quote_plus(filename)))
-            self.ws = create_connection(self.base_url)
-            response = self.ws.recv()
-            return json.loads(response)
-        except ConnectionRefusedError as ex:
-            self.logger.debug("connection failed. %s", ex)
-            return {}
+        with self._lock:
+            self.close()
+            try:
+                # self.ws = create_connection(self.base_url.format(urllib.parse.quote_plus(filename)))
+                self.ws = create_connection(self.base_url)
+                self.connects += 1
+                response = self.ws.recv()
+                return json.loads(response)
+            except (OSError, WebSocketException) as ex:
+                self.logger.debug("connection failed. %s", ex)
+                self.close()
+                return {}
 
     def close(self):
         """Close connection."""
-        if self.ws is not None:
-            self.ws.close()
+        with self._lock:
+            if self.ws is not None:
+                try:
+                    with self._send_lock:
+                        self.ws.close()
+                except (OSError, WebSocketException) as ex:
+                    self.logger.debug("close failed. %s", ex)
+            self.ws = None
+            self._doc = None
+
+    def is_connected(self):
+        """Return True if the connection is established."""
+        return self.ws is not None and self.ws.connected
+
+    def open_session(self):
+        """Start session mode: keep the connection alive across reloads.
+
+           :returns: False if connection failed, else True.
+        """
+        with self._lock:
+            self._session = True
+            if not self.is_connected():
+                self.connect()
+
+            if self.heartbeat and self._heartbeat_thread is None:
+                self._stop_heartbeat.clear()
+                self._heartbeat_thread = threading.Thread(target=self._run_heartbeat, daemon=True)
+                self._heartbeat_thread.start()
+
+            return self.is_connected()
+
+    def close_session(self):
+        """Stop session mode and close connection."""
+        self._stop_heartbeat.set()
+        if self._heartbeat_thread is not None:
+            self._heartbeat_thread.join()
+            self._heartbeat_thread = None
+        with self._lock:
+            self._session = False
+            self.close()
 
-    def apply_method(self, params):
+    def _run_heartbeat(self):
+        while not self._stop_heartbeat.wait(self.heartbeat):
+            # pings are sent during long requests (e.g. a reload holding the lock) as well
+            ws = self.ws
+            if ws is None:
+                continue
+            try:
+                with self._send_lock:
+                    ws.ping()
+            except (OSError, WebSocketException) as ex:
+                self.logger.debug("heartbeat failed, reconnecting. %s", ex)
+                # a running request notices the lost connection itself
+                if self._lock.acquire(blocking=False):
+                    try:
+                        if self.ws is ws:
+                            self.connect()
+                    finally:
+                        self._lock.release()
+
+    def apply_method(self, params, progress=None, interval=1.0):
         """Apply a method by sending params to websocket.
 
+           The request is tagged with a new id, notifications and responses to other ids are skipped.
+
+           :param progress: The optional callable getting the GetProgress data (qProgressData) of the request,
+                            polled on the same connection every interval seconds while waiting for the response.
+           :param interval: The polling interval in seconds.
            :returns: The response in json format (dict).
         """
-        if self.ws is None:
-            self.logger.debug("connection needed")
-            return {}
-
-        self.ws.send(json.dumps(params))
-        response = self.ws.recv()
-        return json.loads(response)
+        with self._lock:
+            if self.ws is None:
+                self.logger.debug("connection needed")
+                return {}
+
+            request_id = next(self._ids)
+            progress_ids = set()
+            timeout = self.ws.gettimeout()
+            try:
+                self._send({**params, "jsonrpc": "2.0", "id": request_id})
+                if progress is not None:
+                    self.ws.settimeout(interval)
+                while True:
+                    try:
+                        response = json.loads(self.ws.recv())
+                    except WebSocketTimeoutException:
+                        if progress is None:
+                            raise
+                        progress_id = next(self._ids)
+                        progress_ids.add(progress_id)
+                        self._send({"jsonrpc": "2.0", "id": progress_id, "handle": -1,
+                                    "method": "GetProgress", "params": {"qRequestId": request_id}})
+                        continue
+                    if response.get("id") == request_id:
+                        if progress is not None:
+                            self.ws.settimeout(timeout)
+                            # the final progress (remaining script log lines), after the answers to outstanding polls
+                            progress_id = next(self._ids)
+                            progress_ids.add(progress_id)
+                            self._send({"jsonrpc": "2.0", "id": progress_id, "handle": -1,
+                                        "method": "GetProgress", "params": {"qRequestId": request_id}})
+                            while progress_ids:
+                                self._progress(json.loads(self.ws.recv()), progress_ids, progress)
+                        return response
+                    self._progress(response, progress_ids, progress)
+            except (OSError, WebSocketException) as ex:
+                # connection lost, it's re-established by the next reload in session mode
+                self.logger.debug("%s failed. %s", params.get("method"), ex)
+                self.close()
+                return {"error": {"message": "connection lost. {0}".format(ex)}}
+            finally:
+                if self.ws is not None:
+                    self.ws.settimeout(timeout)
+
+    def _send(self, message):
+        with self._send_lock:
+            self.ws.send(json.dumps(message))
+
+    def _progress(self, response, progress_ids, progress):
+        """Pass the answer to a GetProgress poll to progress (other messages are skipped)."""
+        if response.get("id") in progress_ids:
+            progress_ids.discard(response["id"])
+            if response.get("result"):
+                progress(response["result"]["qProgressData"])
+        else:
+            self.logger.debug("skipped message. %s", response.get("method") or response.get("id"))
 
     def get_default_app_folder(self):
-        """Get the default app folder path.
+        """Get the default app folder path (cached once known).
 
            :returns: The path of the default app folder or None.
         """
+        if self._app_folder is not None:
+            return self._app_folder
+
         if self.ws is None:
             self.logger.debug("connection needed")
             return None
@@ -86,48 +437,69 @@ class Qlik(object):
             self.logger.debug("GetDefaultAppFolder failed. %s", response["error"].get("message") or "")
             return None
 
-        return response["result"]["qPath"]
+        self._app_folder = response["result"]["qPath"]
+        return self._app_folder
 
-    def reload_app(self, filename, outfilename=""):
+    def reload_app(self, filename, outfilename="", sources=None, force=False, progress=None, progress_interval=1.0):
         """Reload an existing app from default app folder.
 
            :param filename: The app filename.
            :param outfilename: The optional output filename. Can be used to clone the app.
            :remarks: If filenames are given without path, method loads/stores app within default app folder.
                      (e.g. "C:\\Users\\<username>\\Documents\\Qlik\\Sense\\Apps")
-           :returns: False if reload failed, else True.
+                     In session mode the connection and the default app folder are reused, a lost connection
+                     is re-established and the reload is retried once.
+           :param sources: The optional list of data source file paths or glob patterns. If given (and fingerprints are
+                           configured), the reload is skipped if none of them changed since the last successful reload.
+           :param force: Reload even if no data source changed.
+           :param progress: The optional callable getting progress events (see ReloadProgress) polled during the reload.
+                            The finished load statements are available in last_statements afterwards.
+           :param progress_interval: The polling interval in seconds.
+           :returns: False if reload failed (see last_error), else True (see last_skipped).
+                     The durations in seconds of connect, stage, open, reload, save and total are available in last_timings
+                     (total is set for skipped and failed reloads as well).
         """
-        self.close()
-        try:
-            # self.ws = create_connection(self.base_url.format(urllib.parse.quote_plus(filename)))
-            self.ws = create_connection(self.base_url)
-            response = self.ws.recv()
-        except ConnectionRefusedError as ex:
-            self.logger.debug("Reload failed. %s", ex)
+        with self._lock:
+            started = time.perf_counter()
+            self.last_error = None
+            self.last_skipped = False
+            self.last_timings = {}
+            self.last_statements = []
+
+            try:
+                return self._reload_app(filename, outfilename, sources, force, progress, progress_interval, started)
+            finally:
+                self.last_timings["total"] = time.perf_counter() - started
+
+    def _reload_app(self, filename, outfilename, sources, force, progress, progress_interval, started):
+        fingerprint = None
+        key = filename if filename == os.path.basename(filename) else os.path.abspath(filename)
+        if sources is not None and self.fingerprints is not None:
+            fingerprint = fingerprint_sources(sources, self.fingerprints.method)
+            if not force and self.fingerprints.get(key) == fingerprint:
+                self.logger.debug("%s skipped, data sources unchanged.", filename)
+                self.last_skipped = True
+                return True
+
+        if not self._session:
+            self.close()
+        if not self.is_connected():
+            self.connect()
+        self.last_timings["connect"] = time.perf_counter() - started
+        if not self.is_connected():
+            self.last_error = "connection failed"
+            self.logger.debug("Reload failed. connection needed")
             return False
 
-        handle = -1
-
         # note:
         # actually this is only necessary for creating connection to f
         # "ws://localhost:4848/app/{0}?reloadUri=http://localhost:4848/dev-hub/engine-api-explorer".format(fileabspath)
         # if connection is created with transient url (as it is right now) this method could be skipped.
-        params = {
-            "handle": handle,
-            "method": "GetDefaultAppFolder",
-            "params": {}
-        }
-
-        response = self.apply_method(params)
-
-        if response.get("error") is not None:
-            self.logger.debug("Reload failed. %s", response["error"].get("message") or "")
-
         # something failed so we try to use local path as appfolder
-        appfolder = "." if response.get("error") is not None else response["result"]["qPath"]
+        appfolder = self.get_default_app_folder() or "."
 
         # extension:
-        # if filename is a path filename, copy it to the default app folder (with a unique ID),
+        # if filename is a path filename, stage it in the default app folder (with a unique ID),
         # refresh it therein and remove it afterwards
         newfilename = None
         if filename == os.path.basename(filename):
@@ -137,15 +509,79 @@ class Qlik(object):
                 # as we are working on a copy of original file,
                 # outfilename needs to be specified to refresh the original file as well
                 outfilename = filename
-            newfilename = "{0}\\temp_app_{1}.qvf".format(appfolder, str(uuid.uuid4()))
-            shutil.copyfile(filename, newfilename)
+            newfilename = os.path.join(appfolder, "temp_app_{0}.qvf".format(str(uuid.uuid4())))
+            try:
+                start = time.perf_counter()
+                method = stage_file(filename, newfilename)
+                self.last_timings["stage"] = time.perf_counter() - start
+                self.logger.debug("%s staged by %s", filename, method)
+            except OSError as ex:
+                self.last_error = "staging failed. {0}".format(ex)
+                self.logger.debug("Reload failed. %s", self.last_error)
+                self._remove(newfilename)
+                if not self._session:
+                    self.close()
+                return False
             filename = newfilename
 
+        try:
+            result = self._reload_doc(os.path.basename(filename), outfilename, progress, progress_interval)
+            if result is None and self._session:
+                self.logger.debug("connection lost, retrying reload.")
+                self.connect()
+                result = self._reload_doc(os.path.basename(filename), outfilename, progress, progress_interval)
+        finally:
+            if newfilename is not None:
+                # the engine holds the staged app open as long as the session exists (there's no method to close it),
+                # so the connection is closed to remove the copy right away (the next reload reconnects)
+                self.close()
+                self._remove(newfilename)
+
+        if result:
+            # a failure of the first attempt is not relevant anymore
+            self.last_error = None
+
+        if result and fingerprint is not None:
+            self.fingerprints.set(key, fingerprint)
+
+        if not self._session:
+            self.close()
+        return bool(result)
+
+    def _remove(self, filename):
+        try:
+            if os.path.exists(filename):
+                os.remove(filename)
+        except OSError as ex:
+            self.logger.debug("removing %s failed. %s", filename, ex)
+
+    def _failed(self, response, action="Reload"):
+        """Return True (and record last_error) if response is an error response."""
+        if response.get("error") is None:
+            return False
+        self.last_error = response["error"].get("message") or ""
+        self.logger.debug("%s failed. %s", action, self.last_error)
+        return True
+
+    def _open_doc(self, docname, action="Reload"):
+        """Open an app within the current connection (unless it's open already).
+
+           :returns: The handle of the app or None if failed.
+        """
+        if self._doc is not None and self._doc[0] == docname:
+            return self._doc[1]
+
+        # a session can hold only one open app, so another app needs a new connection
+        if self._doc is not None and self._single_app:
+            self.connect()
+
+        handle = -1
+
         params = {
             "handle": handle,
             "method": "OpenDoc",
             "params": {
-                "qDocName": os.path.basename(filename),
+                "qDocName": docname,
                 "qUserName": "",
                 "qPassword": "",
                 "qSerial": "",
@@ -155,10 +591,14 @@ class Qlik(object):
 
         response = self.apply_method(params)
 
-        if response.get("error") is not None:
-            self.logger.debug("Reload failed. %s", response["error"].get("message") or "")
-            self.close()
-            return False
+        # the engine reports the single open app per session once (unless single_app is given)
+        if self._doc is not None and (response.get("error") or {}).get("code") == LOCERR_APP_ALREADY_OPEN:
+            self._single_app = True
+            self.connect()
+            response = self.apply_method(params)
+
+        if self._failed(response, action):
+            return None
 
         params = {
             "handle": handle,
@@ -168,12 +608,22 @@ class Qlik(object):
 
         response = self.apply_method(params)
 
-        if response.get("error") is not None:
-            self.logger.debug("Reload failed. %s", response["error"].get("message") or "")
-            self.close()
-            return False
+        if self._failed(response, action):
+            return None
+
+        self._doc = (docname, response["result"]["qReturn"]["qHandle"])
+        return self._doc[1]
 
-        handle = response["result"]["qReturn"]["qHandle"]
+    def _reload_doc(self, docname, outfilename, progress=None, progress_interval=1.0):
+        """Open, reload and save an app within the current connection.
+
+           :returns: True if succeeded, False if failed or None if the connection was lost.
+        """
+        start = time.perf_counter()
+        handle = self._open_doc(docname)
+        self.last_timings["open"] = time.perf_counter() - start
+        if handle is None:
+            return None if self.ws is None else False
 
         params = {
             "handle": handle,
@@ -185,11 +635,21 @@ class Qlik(object):
             }
         }
 
-        response = self.apply_method(params)
+        start = time.perf_counter()
+        if progress is not None:
+            reload_progress = ReloadProgress(progress)
+            response = self.apply_method(params, progress=reload_progress.update, interval=progress_interval)
+            self.last_statements = reload_progress.statements
+        else:
+            response = self.apply_method(params)
+        self.last_timings["reload"] = time.perf_counter() - start
 
-        if response.get("error") is not None:
-            self.logger.debug("Reload failed. %s", response["error"].get("message") or "")
-            self.close()
+        if self._failed(response):
+            return None if self.ws is None else False
+
+        if response["result"].get("qReturn") is False:
+            self.last_error = "script reload failed"
+            self.logger.debug("Reload failed. %s", self.last_error)
             return False
 
         params = {
@@ -200,15 +660,147 @@ class Qlik(object):
             }
         }
 
+        start = time.perf_counter()
         response = self.apply_method(params)
+        self.last_timings["save"] = time.perf_counter() - start
 
-        if response.get("error") is not None:
-            self.logger.debug("Reload failed. %s", response["error"].get("message") or "")
-            self.close()
-            return False
-
-        if newfilename is not None:
-            os.remove(newfilename)
+        if self._failed(response):
+            return None if self.ws is None else False
 
-        self.close()
         return True
+
+    def iter_hypercube_pages(self, filename, dimensions, measures=None, page_size=MAX_CELLS):
+        """Create a hypercube over dimensions and measures of an app and yield its data page by page.
+
+           Only one page is kept in memory at once.
+
+           :param filename: The app filename (or path).
+           :param dimensions: The list of field names.
+           :param measures: The optional list of measure expressions (e.g. "Sum(Sales)").
+           :param page_size: The max number of cells per page.
+           :returns: The generator of pages (lists of rows with one value per dimension and measure).
+                     Dimension values are texts, measure values are floats (nan if not numeric).
+        """
+        self.logger.debug("iter_hypercube_pages(\"%s\", \"%s\", \"%s\")", filename, dimensions, measures)
+
+        measures = measures or []
+        width = len(dimensions) + len(measures)
+
+        cube = None
+        try:
+            with self._lock:
+                self.last_error = None
+                if not self._session:
+                    self.close()
+                if not self.is_connected():
+                    self.connect()
+                handle = self._open_doc(filename, "Extraction") if self.is_connected() else None
+                if handle is None:
+                    self.last_error = self.last_error or "connection failed"
+                    return
+
+                params = {
+                    "handle": handle,
+                    "method": "CreateSessionObject",
+                    "params": {
+                        "qProp": {
+                            "qInfo": {"qType": "spycery-hypercube"},
+                            "qHyperCubeDef": {
+                                "qDimensions": [{"qDef": {"qFieldDefs": [dimension]}} for dimension in dimensions],
+                                "qMeasures": [{"qDef": {"qDef": measure}} for measure in measures],
+                                "qInitialDataFetch": [],
+                                "qSuppressZero": False,
+                                "qSuppressMissing": False,
+                                "qMode": "S"
+                            }
+                        }
+                    }
+                }
+
+                response = self.apply_method(params)
+                if self._failed(response, "Extraction"):
+                    return
+                cube = response["result"]["qReturn"]
+
+                response = self.apply_method({"handle": cube["qHandle"], "method": "GetLayout", "params": {}})
+                if self._failed(response, "Extraction"):
+                    return
+                num_rows = response["result"]["qLayout"]["qHyperCube"]["qSize"]["qcy"]
+
+            height = max(1, min(page_size, MAX_CELLS) // max(1, width))
+            for top in range(0, num_rows, height):
+                params = {
+                    "handle": cube["qHandle"],
+                    "method": "GetHyperCubeData",
+                    "params": {
+                        "qPath": "/qHyperCubeDef",
+                        "qPages": [{"qLeft": 0, "qTop": top, "qWidth": width, "qHeight": min(height, num_rows - top)}]
+                    }
+                }
+
+                response = self.apply_method(params)
+                if self._failed(response, "Extraction"):
+                    return
+
+                rows = []
+                for cells in response["result"]["qDataPages"][0]["qMatrix"]:
+                    row = [cell.get("qText") for cell in cells[:len(dimensions)]]
+                    for cell in cells[len(dimensions):]:
+                        value = cell.get("qNum")
+                        row.append(value if isinstance(value, (int, float)) else float("nan"))
+                    rows.append(row)
+                yield rows
+        finally:
+            # also reached by the early returns of failed steps
+            if cube is not None and self.ws is not None:
+                self.apply_method({"handle": handle, "method": "DestroySessionObject", "params": {"qId": cube["qGenericId"]}})
+            if not self._session:
+                self.close()
+
+    def iter_hypercube_rows(self, filename, dimensions, measures=None, page_size=MAX_CELLS):
+        """Yield the rows of a hypercube over dimensions and measures of an app (see iter_hypercube_pages).
+
+           :returns: The generator of rows (lists with one value per dimension and measure).
+        """
+        for rows in self.iter_hypercube_pages(filename, dimensions, measures, page_size):
+            yield from rows
+
+    def get_hypercube_columns(self, filename, dimensions, measures=None, page_size=MAX_CELLS):
+        """Return the data of a hypercube over dimensions and measures of an app as columns.
+
+           Each page is copied into the column buffers as soon as it arrives, the json is dropped afterwards.
+
+           :param filename: The app filename (or path).
+           :param dimensions: The list of field names.
+           :param measures: The optional list of measure expressions (e.g. "Sum(Sales)").
+           :param page_size: The max number of cells per page.
+           :returns: The column dictionary with key=dimension or measure and value=numpy array
+                     (object arrays of texts for dimensions, float arrays for measures).
+           :raises ValueError: If a name is given twice (e.g. a measure expression equal to a dimension).
+        """
+        import numpy as np
+
+        measures = measures or []
+        names = list(dimensions) + list(measures)
+        if len(set(names)) < len(names):
+            raise ValueError("duplicate columns {0}".format(", ".join(sorted({name for name in names if names.count(name) > 1}))))
+        chunks = {name: [] for name in list(dimensions) + list(measures)}
+
+        for rows in self.iter_hypercube_pages(filename, dimensions, measures, page_size):
+            for i, name in enumerate(dimensions):
+                chunks[name].append(np.array([row[i] for row in rows], dtype=object))
+            for i, name in enumerate(measures, len(dimensions)):
+                chunks[name].append(np.fromiter((row[i] for row in rows), dtype=np.float64, count=len(rows)))
+
+        return {name: np.concatenate(arrays) if arrays else np.empty(0, dtype=object if name in dimensions else np.float64)
+                for name, arrays in chunks.items()}
+
+    def get_hypercube_dataframe(self, filename, dimensions, measures=None, page_size=MAX_CELLS):
+        """Return the data of a hypercube over dimensions and measures of an app as pandas DataFrame.
+
+           :returns: The DataFrame with one column per dimension and measure.
+           :rtype: pandas.DataFrame
+        """
+        import pandas as pd
+
+        return pd.DataFrame(self.get_hypercube_columns(filename, dimensions, measures, page_size))
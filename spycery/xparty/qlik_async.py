@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""This module provides an asyncio client for the QlikSense engine api."""
+
+# standard
+import asyncio
+import itertools
+import json
+import logging
+import threading
+
+# needs websocket-client
+from websocket import create_connection, WebSocketException
+
+
+class AsyncQlik(object):
+    """The AsyncQlik class.
+
+       Sends JSON-RPC requests tagged with ids over one engine connection, so many calls can be outstanding at once.
+       A reader thread dispatches responses to their futures and change notifications to handle listeners.
+
+       Example:
+
+       async with AsyncQlik("localhost:4848") as qlik:
+           handle = await qlik.open_doc("QlikSense App.qvf")
+           infos = await qlik.get_all_infos(handle)
+           layouts = await qlik.get_object_layouts(handle, [info["qId"] for info in infos])
+    """
+
+    def __init__(self, server="localhost:4848"):
+        """Construct a new instance.
+
+           :param server: The engine host and port.
+        """
+        self.base_url = "ws://{0}/app/%3Ftransient%3D?reloadUri=http://{0}/dev-hub/engine-api-explorer".format(server)
+        self.ws = None
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._listeners = {}
+        self._notification_listeners = []
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._reader = None
+        self._loop = None
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def connect(self):
+        """Create connection.
+
+           :returns: The connection notification in json format (dict) or {} if failed.
+        """
+        await self.close()
+        self._loop = asyncio.get_running_loop()
+        try:
+            ws = await self._loop.run_in_executor(None, create_connection, self.base_url)
+        except (OSError, WebSocketException) as ex:
+            self.logger.debug("connection failed. %s", ex)
+            return {}
+        try:
+            response = json.loads(await self._loop.run_in_executor(None, ws.recv))
+        except (OSError, WebSocketException, ValueError) as ex:
+            self.logger.debug("connection failed. %s", ex)
+            ws.abort()
+            ws.shutdown()
+            return {}
+        self.ws = ws
+
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+        return response
+
+    async def close(self):
+        """Close connection, outstanding calls fail with ConnectionError."""
+        ws, self.ws = self.ws, None
+        if ws is None:
+            return
+
+        try:
+            ws.send_close()
+        except (OSError, WebSocketException) as ex:
+            self.logger.debug("close failed. %s", ex)
+        # wakes up the reader thread
+        ws.abort()
+        if self._reader is not None:
+            await self._loop.run_in_executor(None, self._reader.join)
+            self._reader = None
+        ws.shutdown()
+
+    def _read(self):
+        """Receive messages until the connection is closed and dispatch them (runs on the reader thread)."""
+        ws = self.ws
+        while True:
+            try:
+                message = json.loads(ws.recv())
+            except (OSError, WebSocketException, ValueError) as ex:
+                self.logger.debug("connection closed. %s", ex)
+                break
+
+            if message.get("id") is not None:
+                with self._lock:
+                    future = self._pending.pop(message["id"], None)
+                if future is not None:
+                    self._loop.call_soon_threadsafe(self._resolve, future, message)
+
+            for handle in message.get("change") or []:
+                for callback in list(self._listeners.get(handle, [])):
+                    self._loop.call_soon_threadsafe(callback, handle)
+
+            if message.get("id") is None and message.get("method"):
+                for callback in list(self._notification_listeners):
+                    self._loop.call_soon_threadsafe(callback, message)
+
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            self._loop.call_soon_threadsafe(self._resolve, future, ConnectionError("connection closed"))
+
+    @staticmethod
+    def _resolve(future, message):
+        if future.done():
+            return
+        if isinstance(message, Exception):
+            future.set_exception(message)
+        else:
+            future.set_result(message)
+
+    def add_change_listener(self, handle, callback):
+        """Call callback(handle) whenever the engine reports the object of given handle as changed."""
+        self._listeners.setdefault(handle, []).append(callback)
+
+    def remove_change_listener(self, handle, callback):
+        """Remove a change listener."""
+        callbacks = self._listeners.get(handle, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+
+    def add_notification_listener(self, callback):
+        """Call callback(message) for each notification sent by the engine (e.g. OnConnected)."""
+        self._notification_listeners.append(callback)
+
+    async def apply_method(self, params):
+        """Apply a method by sending params to websocket (tagged with a new request id).
+
+           :returns: The response in json format (dict).
+        """
+        if self.ws is None:
+            self.logger.debug("connection needed")
+            return {}
+
+        request_id = next(self._ids)
+        future = self._loop.create_future()
+        with self._lock:
+            self._pending[request_id] = future
+        try:
+            # sending may block on a slow connection, so it runs on a worker thread
+            await self._loop.run_in_executor(None, self._send, self.ws, json.dumps({**params, "jsonrpc": "2.0", "id": request_id}))
+        except (OSError, WebSocketException) as ex:
+            with self._lock:
+                self._pending.pop(request_id, None)
+            self.logger.debug("%s failed. %s", params.get("method"), ex)
+            return {"error": {"message": "connection lost. {0}".format(ex)}}
+
+        try:
+            return await future
+        except ConnectionError as ex:
+            return {"error": {"message": "connection lost. {0}".format(ex)}}
+
+    def _send(self, ws, message):
+        with self._send_lock:
+            ws.send(message)
+
+    async def call(self, method, handle=-1, **params):
+        """Apply a method on given handle.
+
+           :returns: The result in json format (dict) or None if failed.
+        """
+        response = await self.apply_method({"handle": handle, "method": method, "params": params})
+        if response.get("error") is not None:
+            self.logger.debug("%s failed. %s", method, response["error"].get("message") or "")
+            return None
+        return response.get("result")
+
+    async def apply_methods(self, list_of_params):
+        """Apply several methods concurrently (pipelined over the connection).
+
+           :returns: The list of responses in json format (dict).
+        """
+        return await asyncio.gather(*[self.apply_method(params) for params in list_of_params])
+
+    async def get_default_app_folder(self):
+        """Get the default app folder path.
+
+           :returns: The path of the default app folder or None.
+        """
+        result = await self.call("GetDefaultAppFolder")
+        return None if result is None else result["qPath"]
+
+    async def get_doc_list(self):
+        """Get the list of apps.
+
+           :returns: The list of doc entries (qDocName, qDocId, ...) or None.
+        """
+        result = await self.call("GetDocList")
+        return None if result is None else result["qDocList"]
+
+    async def open_doc(self, docname, no_data=False):
+        """Open an app.
+
+           :returns: The handle of the app or None.
+        """
+        result = await self.call("OpenDoc", qDocName=docname, qUserName="", qPassword="", qSerial="", qNoData=no_data)
+        return None if result is None else result["qReturn"]["qHandle"]
+
+    async def get_all_infos(self, handle):
+        """Get the identifiers and types of all objects of an app.
+
+           :returns: The list of object infos (qId, qType) or None.
+        """
+        result = await self.call("GetAllInfos", handle=handle)
+        return None if result is None else result["qInfos"]
+
+    async def get_object_layouts(self, handle, object_ids):
+        """Get the layouts of objects of an app, all objects are requested concurrently.
+
+           :returns: The dictionary with key=object id and value=layout (or None if failed).
+        """
+        async def get_layout(object_id):
+            result = await self.call("GetObject", handle=handle, qId=object_id)
+            if result is None:
+                return None
+            result = await self.call("GetLayout", handle=result["qReturn"]["qHandle"])
+            return None if result is None else result["qLayout"]
+
+        layouts = await asyncio.gather(*[get_layout(object_id) for object_id in object_ids])
+        return dict(zip(object_ids, layouts))
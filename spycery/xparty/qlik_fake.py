@@ -0,0 +1,432 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""This module provides a local stand-in for the QlikSense engine api (websocket json-rpc) serving synthetic data."""
+
+# standard
+import base64
+import hashlib
+import json
+import logging
+import os
+import shutil
+import socket
+import socketserver
+import struct
+import tempfile
+import threading
+import time
+
+GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OPCODE_CONTINUATION = 0x0
+OPCODE_TEXT = 0x1
+OPCODE_CLOSE = 0x8
+OPCODE_PING = 0x9
+OPCODE_PONG = 0xA
+
+# max number of cells per GetHyperCubeData page (as the engine)
+MAX_CELLS = 10000
+
+
+def _read_frame(rfile):
+    """Read a websocket frame (rfc 6455).
+
+        :returns: The tuple (fin, opcode, payload) or None if the connection was closed.
+    """
+    header = rfile.read(2)
+    if len(header) < 2:
+        return None
+    fin, opcode = header[0] & 0x80, header[0] & 0x0F
+    masked, length = header[1] & 0x80, header[1] & 0x7F
+    if length == 126:
+        length = struct.unpack("!H", rfile.read(2))[0]
+    elif length == 127:
+        length = struct.unpack("!Q", rfile.read(8))[0]
+    mask = rfile.read(4) if masked else None
+    payload = rfile.read(length)
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return bool(fin), opcode, payload
+
+
+def _write_frame(wfile, opcode, payload=b""):
+    """Write an unmasked, unfragmented websocket frame (rfc 6455)."""
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 65536:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    wfile.write(header + payload)
+    wfile.flush()
+
+
+class FakeQlikEngine(object):
+    """The FakeQlikEngine class.
+
+       Implements the engine methods used by the Qlik classes (app folder, apps, reloads incl. progress,
+       objects and hypercubes) on synthetic data. Apps are the .qvf files of the app folder.
+    """
+
+    def __init__(self, app_folder, reload_time=0.0, num_rows=10000, num_objects=20, single_app=True, failing_apps=None):
+        """Construct a new instance.
+
+            :param str app_folder: The default app folder.
+            :param float reload_time: The duration of a reload in seconds (spread over 4 load statements).
+            :param int num_rows: The number of rows of a hypercube.
+            :param int num_objects: The number of objects of an app.
+            :param bool single_app: A session can hold only one open app (as the engine).
+            :param failing_apps: The optional list of app names whose reloads fail.
+        """
+        self.app_folder = app_folder
+        self.reload_time = reload_time
+        self.num_rows = num_rows
+        self.num_objects = num_objects
+        self.single_app = single_app
+        self.failing_apps = set(failing_apps or [])
+        self.reload_count = 0
+        self.save_count = 0
+        self._lock = threading.Lock()
+
+    def new_session(self):
+        """Return the state of a new session."""
+        return {"doc": None, "handles": {}, "next_handle": 1, "progress": {}, "lock": threading.Lock()}
+
+    def apply(self, session, request):
+        """Apply a request within given session.
+
+            :returns: The response (without jsonrpc and id).
+        """
+        method = request.get("method")
+        handler = getattr(self, "do_{0}".format(method), None)
+        if handler is None:
+            return {"error": {"code": -32601, "message": "Method not found: {0}".format(method)}}
+        try:
+            return handler(session, request.get("handle", -1), request.get("params") or {}, request.get("id"))
+        except (KeyError, TypeError, ValueError, OSError) as ex:
+            return {"error": {"code": -32602, "message": "Invalid params. {0}".format(ex)}}
+
+    def _handle(self, session, obj):
+        with session["lock"]:
+            handle = session["next_handle"]
+            session["next_handle"] += 1
+            session["handles"][handle] = obj
+        return handle
+
+    def _path(self, docname):
+        return docname if os.path.isabs(docname) else os.path.join(self.app_folder, docname)
+
+    def do_EngineVersion(self, session, handle, params, request_id):
+        return {"result": {"qVersion": {"qComponentVersion": "fake"}}}
+
+    def do_GetDefaultAppFolder(self, session, handle, params, request_id):
+        return {"result": {"qPath": self.app_folder}}
+
+    def do_GetDocList(self, session, handle, params, request_id):
+        docs = [{"qDocName": name, "qDocId": self._path(name), "qFileSize": os.path.getsize(self._path(name))}
+                for name in sorted(os.listdir(self.app_folder)) if name.endswith(".qvf")]
+        return {"result": {"qDocList": docs}}
+
+    def do_OpenDoc(self, session, handle, params, request_id):
+        docname = params["qDocName"]
+        doc = session["doc"]
+        if doc is not None:
+            if doc["name"] == docname:
+                return {"result": {"qReturn": {"qType": "Doc", "qHandle": doc["handle"], "qGenericId": docname}}}
+            if self.single_app:
+                return {"error": {"code": 1002, "message": "App already open"}}
+        if not os.path.isfile(self._path(docname)):
+            return {"error": {"code": 1003, "message": "App not found"}}
+        doc = {"type": "Doc", "name": docname}
+        doc["handle"] = self._handle(session, doc)
+        session["doc"] = doc
+        return {"result": {"qReturn": {"qType": "Doc", "qHandle": doc["handle"], "qGenericId": docname}}}
+
+    def do_GetActiveDoc(self, session, handle, params, request_id):
+        doc = session["doc"]
+        if doc is None:
+            return {"error": {"code": 1007, "message": "No active app"}}
+        return {"result": {"qReturn": {"qType": "Doc", "qHandle": doc["handle"], "qGenericId": doc["name"]}}}
+
+    def do_DoReload(self, session, handle, params, request_id):
+        doc = session["handles"][handle]
+        progress = {"started": True, "finished": False, "messages": [], "transient": "", "total": 4, "completed": 0}
+        session["progress"][request_id] = progress
+
+        started = time.perf_counter()
+        for section in range(1, 5):
+            line = "table_{0} << source_{0}".format(section)
+            with session["lock"]:
+                progress["messages"].append(line)
+            time.sleep(self.reload_time / 8)
+            progress["transient"] = "{0} {1:,} Lines fetched".format(line, section * 500)
+            time.sleep(self.reload_time / 8)
+            with session["lock"]:
+                progress["messages"].append("{0:,} Lines fetched".format(section * 1000))
+            progress["completed"] = section
+        progress["finished"] = True
+        progress["transient"] = ""
+        progress["millisecs"] = int((time.perf_counter() - started) * 1000)
+
+        with self._lock:
+            self.reload_count += 1
+        success = doc["name"] not in self.failing_apps
+        return {"result": {"qReturn": success}, "change": [handle]}
+
+    def do_GetProgress(self, session, handle, params, request_id):
+        progress = session["progress"].get(params.get("qRequestId"))
+        if progress is None:
+            return {"result": {"qProgressData": {"qStarted": False, "qFinished": False, "qCompleted": 0, "qTotal": 0,
+                                                 "qKB": 0, "qMillisecs": 0, "qUserInteractionWanted": False,
+                                                 "qPersistentProgress": "", "qTransientProgress": "",
+                                                 "qPersistentProgressMessages": [], "qErrorData": []}}}
+        # persistent messages are delivered once
+        with session["lock"]:
+            messages, progress["messages"] = progress["messages"], []
+        return {"result": {"qProgressData": {"qStarted": progress["started"], "qFinished": progress["finished"],
+                                             "qCompleted": progress["completed"], "qTotal": progress["total"],
+                                             "qKB": 0, "qMillisecs": progress.get("millisecs", 0), "qUserInteractionWanted": False,
+                                             "qPersistentProgress": "\n".join(messages),
+                                             "qTransientProgress": progress["transient"],
+                                             "qPersistentProgressMessages": [], "qErrorData": []}}}
+
+    def do_DoSave(self, session, handle, params, request_id):
+        doc = session["handles"][handle]
+        source = self._path(doc["name"])
+        target = params.get("qFileName") or ""
+        if target and not os.path.isdir(target) and os.path.abspath(target) != os.path.abspath(source):
+            shutil.copyfile(source, target)
+        else:
+            os.utime(source)
+        with self._lock:
+            self.save_count += 1
+        return {"result": {}}
+
+    def do_GetAllInfos(self, session, handle, params, request_id):
+        infos = [{"qId": "object_{0}".format(i), "qType": "sheet" if i % 5 == 0 else "barchart"} for i in range(self.num_objects)]
+        return {"result": {"qInfos": infos}}
+
+    def do_GetObject(self, session, handle, params, request_id):
+        obj = {"type": "GenericObject", "id": params["qId"]}
+        return {"result": {"qReturn": {"qType": "GenericObject", "qHandle": self._handle(session, obj), "qGenericId": params["qId"]}}}
+
+    def do_CreateSessionObject(self, session, handle, params, request_id):
+        prop = params["qProp"]
+        obj = {"type": "GenericObject", "id": (prop.get("qInfo") or {}).get("qId") or "session_object", "prop": prop}
+        return {"result": {"qReturn": {"qType": "GenericObject", "qHandle": self._handle(session, obj), "qGenericId": obj["id"]}}}
+
+    def do_DestroySessionObject(self, session, handle, params, request_id):
+        with session["lock"]:
+            for key, obj in list(session["handles"].items()):
+                if obj.get("id") == params["qId"] and "prop" in obj:
+                    del session["handles"][key]
+                    return {"result": {"qSuccess": True}}
+        return {"result": {"qSuccess": False}}
+
+    def do_GetLayout(self, session, handle, params, request_id):
+        obj = session["handles"][handle]
+        layout = {"qInfo": {"qId": obj.get("id"), "qType": obj.get("type")}, "title": "Title of {0}".format(obj.get("id"))}
+        cube = (obj.get("prop") or {}).get("qHyperCubeDef")
+        if cube is not None:
+            width = len(cube.get("qDimensions") or []) + len(cube.get("qMeasures") or [])
+            layout["qHyperCube"] = {"qSize": {"qcx": width, "qcy": self.num_rows}}
+        return {"result": {"qLayout": layout}}
+
+    def do_GetHyperCubeData(self, session, handle, params, request_id):
+        cube = session["handles"][handle]["prop"]["qHyperCubeDef"]
+        num_dimensions = len(cube.get("qDimensions") or [])
+        width = num_dimensions + len(cube.get("qMeasures") or [])
+        pages = []
+        for page in params["qPages"]:
+            left, top = page.get("qLeft", 0), page.get("qTop", 0)
+            columns = range(left, min(left + page.get("qWidth", 0), width))
+            rows = range(top, min(top + page.get("qHeight", 0), self.num_rows))
+            if page.get("qWidth", 0) * page.get("qHeight", 0) > MAX_CELLS:
+                return {"error": {"code": 7009, "message": "Result too large"}}
+            matrix = []
+            for row in rows:
+                cells = []
+                for column in columns:
+                    if column < num_dimensions:
+                        element = row % (100 * (column + 1))
+                        cells.append({"qText": "D{0}-{1}".format(column, element), "qNum": "NaN", "qElemNumber": element, "qState": "O"})
+                    else:
+                        value = (row * (column + 1)) % 1000 / 10
+                        cells.append({"qText": str(value), "qNum": value, "qElemNumber": 0, "qState": "L"})
+                matrix.append(cells)
+            pages.append({"qMatrix": matrix, "qTails": [], "qArea": {"qLeft": left, "qTop": top, "qWidth": len(columns), "qHeight": len(rows)}})
+        return {"result": {"qDataPages": pages}}
+
+
+class FakeQlikServer(threading.Thread):
+    """The FakeQlikServer class.
+
+       Serves the engine api of FakeQlikEngine via websocket (stdlib only, rfc 6455) to be used instead of QlikSense Desktop.
+       Requests of a connection are processed concurrently (e.g. GetProgress while DoReload), responses are tagged
+       with the request id.
+
+       Example:
+
+       server = FakeQlikServer(latency=0.001, reload_time=0.1)
+       server.start()
+
+       qlik = Qlik(server.server)
+       qlik.reload_app("App.qvf")   # apps are the .qvf files of server.app_folder
+
+       server.stop()
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._host = kwargs.pop("host", None) or "127.0.0.1"
+        self._port = kwargs.pop("port", None) or 0
+        self._latency = kwargs.pop("latency", None) or 0.0
+        app_folder = kwargs.pop("app_folder", None)
+        self._temp_folder = None
+        if app_folder is None:
+            app_folder = self._temp_folder = tempfile.mkdtemp(prefix="qlik_apps_")
+        self.engine = kwargs.pop("engine", None) or FakeQlikEngine(app_folder,
+                                                                    reload_time=kwargs.pop("reload_time", None) or 0.0,
+                                                                    num_rows=kwargs.pop("num_rows", None) or 10000,
+                                                                    num_objects=kwargs.pop("num_objects", None) or 20,
+                                                                    single_app=kwargs.pop("single_app", True),
+                                                                    failing_apps=kwargs.pop("failing_apps", None))
+        for option in ("reload_time", "num_rows", "num_objects", "single_app", "failing_apps"):
+            kwargs.pop(option, None)
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._lock = threading.Lock()
+        self._counts = {}
+        self._connections = set()
+        self.connection_count = 0
+
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+
+            def handle(self):
+                if not self._handshake():
+                    return
+                with server._lock:
+                    server._connections.add(self.connection)
+                    server.connection_count += 1
+                send_lock = threading.Lock()
+                session = server.engine.new_session()
+
+                def send(opcode, payload):
+                    with send_lock:
+                        try:
+                            _write_frame(self.wfile, opcode, payload)
+                        except OSError as ex:
+                            server.logger.debug("send failed. %s", ex)
+
+                def respond(request):
+                    if server._latency:
+                        time.sleep(server._latency)
+                    response = {"jsonrpc": "2.0", "id": request.get("id"), **server.engine.apply(session, request)}
+                    send(OPCODE_TEXT, json.dumps(response).encode("utf-8"))
+
+                send(OPCODE_TEXT, json.dumps({"jsonrpc": "2.0", "method": "OnConnected", "params": {"qSessionState": "SESSION_CREATED"}}).encode("utf-8"))
+
+                message = b""
+                try:
+                    while True:
+                        frame = _read_frame(self.rfile)
+                        if frame is None:
+                            break
+                        fin, opcode, payload = frame
+                        if opcode == OPCODE_CLOSE:
+                            send(OPCODE_CLOSE, payload[:2])
+                            break
+                        if opcode == OPCODE_PING:
+                            send(OPCODE_PONG, payload)
+                            continue
+                        if opcode not in (OPCODE_TEXT, OPCODE_CONTINUATION):
+                            continue
+                        message += payload
+                        if not fin:
+                            continue
+                        request, message = json.loads(message.decode("utf-8")), b""
+                        with server._lock:
+                            server._counts[request.get("method")] = server._counts.get(request.get("method"), 0) + 1
+                        threading.Thread(target=respond, args=(request,), daemon=True).start()
+                except (OSError, ValueError) as ex:
+                    server.logger.debug("connection closed. %s", ex)
+                finally:
+                    with server._lock:
+                        server._connections.discard(self.connection)
+
+            def _handshake(self):
+                request_line = self.rfile.readline().decode("latin-1")
+                headers = {}
+                while True:
+                    line = self.rfile.readline().decode("latin-1").strip()
+                    if not line:
+                        break
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                key = headers.get("sec-websocket-key")
+                if not request_line.startswith("GET") or key is None:
+                    self.wfile.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n")
+                    return False
+                accept = base64.b64encode(hashlib.sha1((key + GUID).encode("ascii")).digest()).decode("ascii")
+                self.wfile.write("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                                 "Sec-WebSocket-Accept: {0}\r\n\r\n".format(accept).encode("ascii"))
+                self.wfile.flush()
+                return True
+
+        class Server(socketserver.ThreadingMixIn, socketserver.TCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+
+        self._server = Server((self._host, self._port), Handler)
+        super().__init__(*args, daemon=True, **kwargs)
+
+    @property
+    def server(self):
+        """The engine host and port (e.g. as server parameter of the Qlik class)."""
+        return "{0}:{1}".format(*self._server.server_address[:2])
+
+    @property
+    def app_folder(self):
+        """The default app folder."""
+        return self.engine.app_folder
+
+    @property
+    def request_count(self):
+        """The number of requests received since start or last reset."""
+        with self._lock:
+            return sum(self._counts.values())
+
+    def request_counts(self):
+        """Return the number of requests received per method."""
+        with self._lock:
+            return dict(self._counts)
+
+    def reset_counts(self):
+        """Reset the request and connection counters."""
+        with self._lock:
+            self._counts = {}
+            self.connection_count = 0
+
+    def drop_connections(self):
+        """Drop all open connections (e.g. to simulate network failures)."""
+        with self._lock:
+            connections = list(self._connections)
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError as ex:
+                self.logger.debug("shutdown failed. %s", ex)
+
+    def run(self):
+        self._server.serve_forever(poll_interval=0.1)
+
+    def stop(self):
+        """Stop serving, drop connections and remove the temporary app folder (if any)."""
+        if self.is_alive():
+            self._server.shutdown()
+        self.drop_connections()
+        self._server.server_close()
+        if self._temp_folder is not None:
+            shutil.rmtree(self._temp_folder, ignore_errors=True)
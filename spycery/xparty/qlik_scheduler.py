@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""This module provides a scheduler reloading many QlikSense apps concurrently."""
+
+# standard
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+import logging
+import queue
+import time
+
+# local
+from spycery.xparty.qlik import Qlik, QlikFingerprints
+
+
+class QlikReloadScheduler(object):
+    """The QlikReloadScheduler class.
+
+       Reloads apps concurrently across one or more engines, at most max_reloads reloads per engine at a time.
+       An app is reloaded after all apps it depends on have been reloaded successfully, it is skipped if one of them failed.
+       With fingerprints and declared data sources, apps whose data sources didn't change (and whose dependencies
+       weren't reloaded) are skipped.
+
+       Example:
+
+       scheduler = QlikReloadScheduler(servers=["host1:4848", "host2:4848"], max_reloads=2)
+       report = scheduler.run(["Sales.qvf", "Stock.qvf", "Dashboard.qvf"],
+                              dependencies={"Dashboard.qvf": ["Sales.qvf", "Stock.qvf"]})
+       failed = [app for app, result in report.items() if not result["success"]]
+    """
+
+    def __init__(self, servers=None, max_reloads=1, heartbeat=30.0, fingerprints=None):
+        """Construct a new instance.
+
+           :param servers: The list of engine hosts and ports (default is ["localhost:4848"]).
+           :param int max_reloads: The max number of concurrent reloads per engine.
+           :param heartbeat: The interval in seconds of websocket pings (0 disables heartbeats).
+           :param fingerprints: The optional QlikFingerprints instance or json file path storing data source fingerprints.
+        """
+        self.servers = list(servers or ["localhost:4848"])
+        self.max_reloads = max(1, max_reloads)
+        self.heartbeat = heartbeat
+        self.fingerprints = QlikFingerprints(fingerprints) if isinstance(fingerprints, str) else fingerprints
+        self.report = {}
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def run(self, apps, dependencies=None, outfilenames=None, sources=None, force=False):
+        """Reload apps.
+
+           :param apps: The list of app filenames (see Qlik.reload_app).
+           :param dependencies: The optional dictionary with key=app and value=list of apps to be reloaded before.
+           :param outfilenames: The optional dictionary with key=app and value=output filename.
+           :param sources: The optional dictionary with key=app and value=list of data source file paths or glob patterns.
+           :param force: Reload all apps even if no data source changed.
+
+           :returns: The report dictionary with key=app and value=dict(success, skipped, server, started, duration, timings, error).
+                     The timings are the durations of connect, stage, open, reload and save (see Qlik.reload_app).
+           :rtype: dict(string, dict)
+        """
+        self.logger.debug("run(\"%s\", \"%s\")", apps, dependencies)
+
+        apps = list(dict.fromkeys(apps))
+        dependencies = {app: set(dependencies.get(app) or []) if dependencies else set() for app in apps}
+        outfilenames = outfilenames or {}
+        sources = sources or {}
+        self.report = {}
+
+        for app, required in dependencies.items():
+            unknown = required.difference(apps)
+            if unknown:
+                self._skip(app, "unknown dependencies: {0}".format(", ".join(sorted(unknown))))
+
+        # one session per reload slot, each engine has max_reloads slots
+        sessions = queue.Queue()
+        for server in self.servers:
+            for _ in range(self.max_reloads):
+                sessions.put(Qlik(server, heartbeat=self.heartbeat, fingerprints=self.fingerprints))
+
+        def reload(app):
+            # apps depending on reloaded apps are reloaded as well
+            forced = force or any(not self.report[dependency]["skipped"] for dependency in dependencies[app])
+            session = sessions.get()
+            started = datetime.now()
+            start = time.perf_counter()
+            skipped = False
+            timings = {}
+            try:
+                success = session.reload_app(app, outfilenames.get(app, ""), sources=sources.get(app), force=forced)
+                skipped = session.last_skipped
+                timings = session.last_timings
+                error = None if success else session.last_error or "reload failed"
+            except Exception as ex:
+                success, error = False, str(ex)
+            finally:
+                sessions.put(session)
+            return {"success": success, "skipped": skipped, "server": session.server, "started": started,
+                    "duration": time.perf_counter() - start, "timings": timings, "error": error}
+
+        try:
+            for session in list(sessions.queue):
+                session.open_session()
+
+            with ThreadPoolExecutor(max_workers=len(self.servers) * self.max_reloads) as executor:
+                running = {}
+                while True:
+                    changed = True
+                    while changed:
+                        changed = False
+                        for app in apps:
+                            if app in self.report or app in running.values():
+                                continue
+                            failed = [dependency for dependency in dependencies[app] if dependency in self.report and not self.report[dependency]["success"]]
+                            if failed:
+                                # skipping may skip further apps
+                                self._skip(app, "dependencies failed: {0}".format(", ".join(sorted(failed))))
+                                changed = True
+                            elif all(dependency in self.report for dependency in dependencies[app]):
+                                running[executor.submit(reload, app)] = app
+
+                    if not running:
+                        break
+
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        app = running.pop(future)
+                        self.report[app] = future.result()
+                        self.logger.debug("%s reloaded (success=%s) in %.1fs", app, self.report[app]["success"], self.report[app]["duration"])
+        finally:
+            while not sessions.empty():
+                sessions.get().close_session()
+
+        # whatever is left waits for itself (dependency cycle)
+        for app in apps:
+            if app not in self.report:
+                self._skip(app, "dependency cycle")
+
+        return {app: self.report[app] for app in apps}
+
+    def _skip(self, app, error):
+        self.logger.debug("%s skipped. %s", app, error)
+        self.report[app] = {"success": False, "skipped": True, "server": None, "started": None, "duration": 0.0, "timings": {}, "error": error}